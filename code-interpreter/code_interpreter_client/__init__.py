@@ -0,0 +1,18 @@
+"""Python client for the Code Interpreter API.
+
+Both clients keep connections alive in a shared pool, stream uploads and
+downloads, retry ``429``/``503`` responses with backoff (honoring
+``Retry-After``) and can run many executions with bounded concurrency.
+"""
+
+from ._base import APIError, CodeInterpreterError, RetryPolicy
+from .async_client import AsyncCodeInterpreterClient
+from .client import CodeInterpreterClient
+
+__all__ = [
+    "APIError",
+    "AsyncCodeInterpreterClient",
+    "CodeInterpreterClient",
+    "CodeInterpreterError",
+    "RetryPolicy",
+]
@@ -0,0 +1,144 @@
+"""Request building, response handling and retry policy shared by both clients."""
+
+import os
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+
+DEFAULT_BASE_URL = "http://localhost:8700"
+CHUNK_SIZE = 1024 * 1024
+
+# A path on disk, or an open binary file with the name to upload it as
+UploadSource = Union[str, os.PathLike, Tuple[str, BinaryIO]]
+
+
+class CodeInterpreterError(Exception):
+    """Base class for client errors."""
+
+
+class APIError(CodeInterpreterError):
+    """The service answered with an error status."""
+
+    def __init__(self, status_code: int, detail: Any, response: Optional[httpx.Response] = None):
+        super().__init__(f"HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.response = response
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before retrying a request.
+
+    Only responses that mean the request was not processed (429, 503 by
+    default) and connection failures are retried, so retrying ``/exec``
+    never runs code twice.
+    """
+
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    max_backoff: float = 30.0
+    retry_statuses: Tuple[int, ...] = (429, 503)
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retry number ``attempt + 1``.
+
+        ``Retry-After`` (seconds or an HTTP date) wins when the server sends
+        it; otherwise exponential backoff with full jitter.
+        """
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _seekable(fileobj: BinaryIO) -> bool:
+    return getattr(fileobj, "seekable", lambda: False)()
+
+
+# Connection failures happen before the request reaches the service
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class BaseClient:
+    def __init__(self, base_url: str, api_key: Optional[str], retry: Optional[RetryPolicy]):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("CODE_API_KEY", "default-api-key")
+        self.retry = retry or RetryPolicy()
+
+    def _headers(self) -> Dict[str, str]:
+        return {"x-api-key": self.api_key}
+
+    @staticmethod
+    def _limits(max_connections: int) -> httpx.Limits:
+        return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    @staticmethod
+    def _exec_payload(code: str, lang: str, args: Optional[str], entity_id: Optional[str],
+                      files: Optional[Sequence[dict]], options: Dict[str, Any]) -> dict:
+        payload = {"code": code, "lang": lang, **options}
+        if args is not None:
+            payload["args"] = args
+        if entity_id is not None:
+            payload["entity_id"] = entity_id
+        if files is not None:
+            payload["files"] = list(files)
+        return payload
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        if response.status_code < 400:
+            return
+        try:
+            body = response.json()
+            detail = body.get("detail", body.get("error", body)) if isinstance(body, dict) else body
+        except ValueError:
+            detail = response.text
+        raise APIError(response.status_code, detail, response)
+
+    @staticmethod
+    def _can_resend(sources: Optional[Sequence[UploadSource]]) -> bool:
+        """Whether a retry could send every upload source again from the start."""
+        return sources is None or all(not isinstance(source, tuple) or _seekable(source[1]) for source in sources)
+
+    @staticmethod
+    def _open_uploads(sources: Sequence[UploadSource]) -> Tuple[List[tuple], List[BinaryIO]]:
+        """Multipart ``files`` for one attempt and the handles this call opened.
+
+        httpx reads file objects in chunks, so uploads stream from disk.
+        """
+        files, opened = [], []
+        for source in sources:
+            if isinstance(source, tuple):
+                name, fileobj = source
+                if _seekable(fileobj):
+                    fileobj.seek(0)
+            else:
+                name = os.path.basename(os.fspath(source))
+                fileobj = open(source, "rb")
+                opened.append(fileobj)
+            files.append(("files", (name, fileobj)))
+        return files, opened
@@ -0,0 +1,142 @@
+"""asyncio client."""
+
+import asyncio
+import os
+from typing import Any, BinaryIO, Iterable, List, Optional, Sequence, Union
+
+import httpx
+
+from ._base import CHUNK_SIZE, RETRYABLE_ERRORS, BaseClient, RetryPolicy, UploadSource
+
+
+class AsyncCodeInterpreterClient(BaseClient):
+    """asyncio client with a shared keep-alive connection pool::
+
+        async with AsyncCodeInterpreterClient("http://localhost:8700", api_key="...") as client:
+            results = await client.execute_many(
+                [{"code": f"print({i} ** 2)", "lang": "py"} for i in range(100)],
+                concurrency=16
+            )
+    """
+
+    def __init__(self, base_url: str = None, api_key: Optional[str] = None, timeout: float = 60.0,
+                 max_connections: int = 20, retry: Optional[RetryPolicy] = None):
+        super().__init__(base_url, api_key, retry)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self._headers(),
+            timeout=timeout,
+            limits=self._limits(max_connections)
+        )
+        self.max_connections = max_connections
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _send(self, method: str, path: str, stream: bool = False, uploads: Sequence[UploadSource] = None,
+                    **kwargs) -> httpx.Response:
+        attempt = 0
+        # A pipe or socket read by the first attempt cannot be sent again
+        can_retry = self._can_resend(uploads)
+        while True:
+            opened = []
+            try:
+                if uploads is not None:
+                    kwargs["files"], opened = self._open_uploads(uploads)
+                request = self._client.build_request(method, path, **kwargs)
+                response = await self._client.send(request, stream=stream)
+            except RETRYABLE_ERRORS:
+                if not can_retry or not self.retry.should_retry(attempt):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            finally:
+                for fileobj in opened:
+                    fileobj.close()
+            if can_retry and self.retry.should_retry(attempt, response.status_code):
+                await response.aclose()
+                await asyncio.sleep(self.retry.delay(attempt, response))
+                attempt += 1
+                continue
+            if response.status_code >= 400 and stream:
+                await response.aread()
+            self._raise_for_status(response)
+            return response
+
+    # Endpoints
+
+    async def execute(self, code: str, lang: str, args: Optional[str] = None, entity_id: Optional[str] = None,
+                      files: Optional[Sequence[dict]] = None, **options: Any) -> dict:
+        """Run ``code`` via ``/exec``; extra ``options`` (``inline_files``, ``profile``, ...) are passed through."""
+        payload = self._exec_payload(code, lang, args, entity_id, files, options)
+        return (await self._send("POST", "/exec", json=payload)).json()
+
+    async def execute_many(self, jobs: Iterable[dict], concurrency: int = 8,
+                           return_exceptions: bool = False) -> List[Any]:
+        """Run many ``execute`` calls with at most ``concurrency`` in flight.
+
+        Each job is a dict of ``execute`` keyword arguments.  Results come
+        back in job order; with ``return_exceptions`` failures are returned
+        in place instead of raised, as with :func:`asyncio.gather`.
+        """
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, self.max_connections)))
+
+        async def run(job: dict):
+            async with semaphore:
+                return await self.execute(**job)
+
+        return await asyncio.gather(*(run(job) for job in jobs), return_exceptions=return_exceptions)
+
+    async def upload(self, files: Sequence[UploadSource], entity_id: Optional[str] = None) -> dict:
+        """Upload files (paths or ``(name, binary file)`` pairs) into a session, streaming them.
+
+        The upload is only retried if every file object is seekable.
+        """
+        data = {"entity_id": entity_id} if entity_id else None
+        return (await self._send("POST", "/upload", uploads=list(files), data=data)).json()
+
+    async def list_files(self, session_id: str, detail: str = "simple") -> List[dict]:
+        return (await self._send("GET", f"/files/{session_id}", params={"detail": detail})).json()
+
+    async def delete_file(self, session_id: str, file_id: str) -> dict:
+        return (await self._send("DELETE", f"/files/{session_id}/{file_id}")).json()
+
+    async def download(self, session_id: str, file_id: str,
+                       dest: Union[str, os.PathLike, BinaryIO, None] = None) -> Union[bytes, str, BinaryIO]:
+        """Download a file, streaming it into ``dest`` (a path or binary file) if given.
+
+        Without ``dest`` the content is returned as bytes.
+        """
+        response = await self._send("GET", f"/download/{session_id}/{file_id}", stream=True)
+        try:
+            if dest is None:
+                return await response.aread()
+            if hasattr(dest, "write"):
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    dest.write(chunk)
+                return dest
+            tmp_path = f"{os.fspath(dest)}.part"
+            with open(tmp_path, "wb") as f:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(tmp_path, dest)
+            return os.fspath(dest)
+        finally:
+            await response.aclose()
+
+    async def health(self) -> dict:
+        return (await self._send("GET", "/health")).json()
+
+    async def ready(self) -> dict:
+        """Readiness report; unlike other calls a ``503`` (still warming up) is returned, not raised."""
+        response = await self._client.get("/ready")
+        if response.status_code not in (200, 503):
+            self._raise_for_status(response)
+        return response.json()
@@ -0,0 +1,137 @@
+"""Synchronous client."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Iterable, List, Optional, Sequence, Union
+
+import httpx
+
+from ._base import CHUNK_SIZE, RETRYABLE_ERRORS, BaseClient, RetryPolicy, UploadSource
+
+
+class CodeInterpreterClient(BaseClient):
+    """Blocking client with a shared keep-alive connection pool.
+
+    The client is thread-safe; use one instance per process and close it (or
+    use it as a context manager) when done::
+
+        with CodeInterpreterClient("http://localhost:8700", api_key="...") as client:
+            result = client.execute("print(1 + 1)", "py")
+            print(result["run"]["stdout"])
+    """
+
+    def __init__(self, base_url: str = None, api_key: Optional[str] = None, timeout: float = 60.0,
+                 max_connections: int = 20, retry: Optional[RetryPolicy] = None):
+        super().__init__(base_url, api_key, retry)
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            headers=self._headers(),
+            timeout=timeout,
+            limits=self._limits(max_connections)
+        )
+        self.max_connections = max_connections
+
+    def close(self):
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, method: str, path: str, stream: bool = False, uploads: Sequence[UploadSource] = None,
+              **kwargs) -> httpx.Response:
+        attempt = 0
+        # A pipe or socket read by the first attempt cannot be sent again
+        can_retry = self._can_resend(uploads)
+        while True:
+            opened = []
+            try:
+                if uploads is not None:
+                    kwargs["files"], opened = self._open_uploads(uploads)
+                request = self._client.build_request(method, path, **kwargs)
+                response = self._client.send(request, stream=stream)
+            except RETRYABLE_ERRORS:
+                if not can_retry or not self.retry.should_retry(attempt):
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            finally:
+                for fileobj in opened:
+                    fileobj.close()
+            if can_retry and self.retry.should_retry(attempt, response.status_code):
+                response.close()
+                time.sleep(self.retry.delay(attempt, response))
+                attempt += 1
+                continue
+            if response.status_code >= 400 and stream:
+                response.read()
+            self._raise_for_status(response)
+            return response
+
+    # Endpoints
+
+    def execute(self, code: str, lang: str, args: Optional[str] = None, entity_id: Optional[str] = None,
+                files: Optional[Sequence[dict]] = None, **options: Any) -> dict:
+        """Run ``code`` via ``/exec``; extra ``options`` (``inline_files``, ``profile``, ...) are passed through."""
+        payload = self._exec_payload(code, lang, args, entity_id, files, options)
+        return self._send("POST", "/exec", json=payload).json()
+
+    def execute_many(self, jobs: Iterable[dict], concurrency: int = 8) -> List[dict]:
+        """Run many ``execute`` calls with at most ``concurrency`` in flight.
+
+        Each job is a dict of ``execute`` keyword arguments.  Results come
+        back in job order; the first failure is raised.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, self.max_connections))) as pool:
+            return list(pool.map(lambda job: self.execute(**job), jobs))
+
+    def upload(self, files: Sequence[UploadSource], entity_id: Optional[str] = None) -> dict:
+        """Upload files (paths or ``(name, binary file)`` pairs) into a session, streaming them.
+
+        The upload is only retried if every file object is seekable.
+        """
+        data = {"entity_id": entity_id} if entity_id else None
+        return self._send("POST", "/upload", uploads=list(files), data=data).json()
+
+    def list_files(self, session_id: str, detail: str = "simple") -> List[dict]:
+        return self._send("GET", f"/files/{session_id}", params={"detail": detail}).json()
+
+    def delete_file(self, session_id: str, file_id: str) -> dict:
+        return self._send("DELETE", f"/files/{session_id}/{file_id}").json()
+
+    def download(self, session_id: str, file_id: str,
+                 dest: Union[str, os.PathLike, BinaryIO, None] = None) -> Union[bytes, str, BinaryIO]:
+        """Download a file, streaming it into ``dest`` (a path or binary file) if given.
+
+        Without ``dest`` the content is returned as bytes.
+        """
+        response = self._send("GET", f"/download/{session_id}/{file_id}", stream=True)
+        try:
+            if dest is None:
+                return response.read()
+            if hasattr(dest, "write"):
+                for chunk in response.iter_bytes(CHUNK_SIZE):
+                    dest.write(chunk)
+                return dest
+            tmp_path = f"{os.fspath(dest)}.part"
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(tmp_path, dest)
+            return os.fspath(dest)
+        finally:
+            response.close()
+
+    def health(self) -> dict:
+        return self._send("GET", "/health").json()
+
+    def ready(self) -> dict:
+        """Readiness report; unlike other calls a ``503`` (still warming up) is returned, not raised."""
+        response = self._client.get("/ready")
+        if response.status_code not in (200, 503):
+            self._raise_for_status(response)
+        return response.json()
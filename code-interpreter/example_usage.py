@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
-import requests
-import json
+from code_interpreter_client import APIError, CodeInterpreterClient
 
 def execute_code_sample():
     """
@@ -12,11 +11,8 @@ def execute_code_sample():
     API_BASE_URL = "http://localhost:8700"
     API_KEY = "your-code-api-key-here"
     
-    # Headers for all requests
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": API_KEY
-    }
+    # One client for all requests, reusing its connections
+    client = CodeInterpreterClient(API_BASE_URL, api_key=API_KEY)
     
     print("🧪 Code Interpreter API Sample Usage")
     print("=" * 40)
@@ -32,21 +28,15 @@ print("Available modules:", list(__import__('sys').modules.keys())[:10])
         "lang": "py"
     }
     
-    response = requests.post(
-        f"{API_BASE_URL}/exec",
-        headers=headers,
-        json=exec_data
-    )
-    
-    if response.status_code == 200:
-        result = response.json()
+    try:
+        result = client.execute(**exec_data)
         print(f"✅ Success!")
         print(f"STDOUT:\n{result['run']['stdout']}")
         if result['run']['stderr']:
             print(f"STDERR:\n{result['run']['stderr']}")
-    else:
-        print(f"❌ Failed with status {response.status_code}")
-        print(response.text)
+    except APIError as e:
+        print(f"❌ Failed with status {e.status_code}")
+        print(e.detail)
     
     # 2. Execute code that generates a file
     print("\n2. Executing code that generates a file:")
@@ -66,14 +56,8 @@ with open("sample_output.txt", "r") as f:
         "lang": "py"
     }
     
-    response = requests.post(
-        f"{API_BASE_URL}/exec",
-        headers=headers,
-        json=exec_data
-    )
-    
-    if response.status_code == 200:
-        result = response.json()
+    try:
+        result = client.execute(**exec_data)
         print(f"✅ Success!")
         print(f"STDOUT:\n{result['run']['stdout']}")
         if result['files']:
@@ -81,20 +65,37 @@ with open("sample_output.txt", "r") as f:
             for file in result['files']:
                 print(f"  - {file['name']}")
             print(f"Session ID: {result['session_id']}")
-    else:
-        print(f"❌ Failed with status {response.status_code}")
-        print(response.text)
+            
+            # Download the generated file
+            content = client.download(result['session_id'], result['files'][0]['name'])
+            print(f"Downloaded {len(content)} bytes of {result['files'][0]['name']}")
+    except APIError as e:
+        print(f"❌ Failed with status {e.status_code}")
+        print(e.detail)
     
-    # 3. Health check
-    print("\n3. Checking service health:")
-    response = requests.get(f"{API_BASE_URL}/health")
+    # 3. Run several snippets at once
+    print("\n3. Executing several snippets concurrently:")
+    try:
+        results = client.execute_many(
+            [{"code": f"print({i} ** 2)", "lang": "py"} for i in range(5)],
+            concurrency=5
+        )
+        print(f"✅ Success!")
+        print(f"Squares: {[result['run']['stdout'].strip() for result in results]}")
+    except APIError as e:
+        print(f"❌ Failed with status {e.status_code}")
+        print(e.detail)
     
-    if response.status_code == 200:
-        result = response.json()
+    # 4. Health check
+    print("\n4. Checking service health:")
+    try:
+        result = client.health()
         print(f"✅ Service is healthy!")
         print(f"Timestamp: {result['timestamp']}")
-    else:
-        print(f"❌ Health check failed with status {response.status_code}")
+    except APIError as e:
+        print(f"❌ Health check failed with status {e.status_code}")
+    
+    client.close()
 
 if __name__ == "__main__":
     execute_code_sample()
\ No newline at end of file
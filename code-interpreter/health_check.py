@@ -1,23 +1,28 @@
 #!/usr/bin/env python3
 
+import os
 import requests
 import sys
 
-def health_check():
+BASE_URL = f"http://localhost:{os.getenv('PORT', '8700')}"
+
+def health_check(path="/health"):
     try:
-        response = requests.get("http://localhost:8700/v1/health", timeout=5)
+        response = requests.get(f"{BASE_URL}{path}", timeout=5)
         if response.status_code == 200:
-            print("Health check: OK")
+            print(f"Health check ({path}): OK")
             return True
         else:
-            print(f"Health check failed with status code: {response.status_code}")
+            print(f"Health check ({path}) failed with status code: {response.status_code}")
             return False
     except Exception as e:
-        print(f"Health check failed with error: {e}")
+        print(f"Health check ({path}) failed with error: {e}")
         return False
 
 if __name__ == "__main__":
-    if health_check():
+    # --ready checks that the toolchains are warmed up, not just that the process is alive
+    path = "/ready" if "--ready" in sys.argv[1:] else "/health"
+    if health_check(path):
         sys.exit(0)
     else:
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
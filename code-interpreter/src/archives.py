@@ -0,0 +1,367 @@
+"""Streaming archive creation and extraction for whole sessions.
+
+Downloads are generated on the fly: :func:`iter_archive` yields archive bytes
+as it reads each file, so nothing is staged on disk and memory use stays at a
+few chunks regardless of session size.  ``zip`` entries are written with data
+descriptors (no seeking needed); tar variants are written block by block.
+
+Uploads are extracted while the request body is still arriving:
+:class:`ChunkPipe` turns the async body stream into a blocking reader for
+:func:`extract_archive`, which runs in a worker thread and enforces per-entry,
+total size and entry-count limits on the bytes actually written.
+"""
+
+import collections
+import errno
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from typing import Callable, Iterable, Iterator, List, NamedTuple
+
+from tiering import INCOMPRESSIBLE_EXTENSIONS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+
+ARCHIVE_FORMATS = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+    "tar.gz": "application/gzip",
+    "tar.zst": "application/zstd",
+}
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+
+
+class ArchiveFormatError(ValueError):
+    """Raised for unknown, unsupported or malformed archives."""
+
+
+class ArchiveLimitError(ValueError):
+    """Raised when an uploaded archive exceeds the configured limits."""
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    size: int
+    mtime: float
+    read: Callable[[], Iterable[bytes]]
+
+
+def iter_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+# Creation
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable sink that collects written bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_zip(entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as zf:
+        for entry in entries:
+            date_time = max(time.localtime(entry.mtime)[:6], (1980, 1, 1, 0, 0, 0))
+            info = zipfile.ZipInfo(entry.name, date_time=date_time)
+            info.external_attr = 0o644 << 16
+            info.file_size = entry.size
+            info.compress_type = zipfile.ZIP_STORED \
+                if entry.name.lower().endswith(INCOMPRESSIBLE_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            with zf.open(info, "w", force_zip64=entry.size >= zipfile.ZIP64_LIMIT) as dest:
+                for chunk in entry.read():
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory, written on close
+    yield buffer.drain()
+
+
+def _iter_tar(entries: Iterable[ArchiveEntry], compression: str) -> Iterator[bytes]:
+    buffer = _StreamBuffer()
+    if compression == "zst":
+        sink = zstandard.ZstdCompressor(level=3).stream_writer(buffer, closefd=False)
+    elif compression == "gz":
+        sink = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6)
+    else:
+        sink = buffer
+
+    for entry in entries:
+        info = tarfile.TarInfo(entry.name)
+        info.size = entry.size
+        info.mtime = int(entry.mtime)
+        info.mode = 0o644
+        sink.write(info.tobuf(format=tarfile.PAX_FORMAT))
+        # The header already promised ``size`` bytes: clip or pad if the
+        # file changed while it was being streamed
+        written = 0
+        for chunk in entry.read():
+            chunk = chunk[:entry.size - written]
+            sink.write(chunk)
+            written += len(chunk)
+            data = buffer.drain()
+            if data:
+                yield data
+        if written < entry.size:
+            sink.write(b"\0" * (entry.size - written))
+        sink.write(b"\0" * (-entry.size % tarfile.BLOCKSIZE))
+
+    sink.write(b"\0" * (2 * tarfile.BLOCKSIZE))
+    if sink is not buffer:
+        sink.close()
+    yield buffer.drain()
+
+
+def iter_archive(entries: Iterable[ArchiveEntry], archive_format: str) -> Iterator[bytes]:
+    """Yield an archive of ``entries`` in ``archive_format`` chunk by chunk."""
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ArchiveFormatError(f"Unsupported archive format: {archive_format}")
+    if archive_format == "tar.zst" and zstandard is None:
+        raise ArchiveFormatError("tar.zst archives require the zstandard package")
+    if archive_format == "zip":
+        return _iter_zip(entries)
+    return _iter_tar(entries, archive_format.partition(".")[2])
+
+
+# Extraction
+
+class ChunkPipe(io.RawIOBase):
+    """Blocking reader over chunks fed from another thread.
+
+    :meth:`feed` blocks while ``max_chunks`` chunks are pending, which bounds
+    memory use when the consumer is slower than the network.  It returns
+    ``False`` once the consumer has stopped reading.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        self._chunks = collections.deque()
+        self._cond = threading.Condition()
+        self._max_chunks = max_chunks
+        self._eof = False
+        self._abandoned = False
+        self._current = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def feed(self, data: bytes) -> bool:
+        with self._cond:
+            while len(self._chunks) >= self._max_chunks and not self._abandoned:
+                self._cond.wait()
+            if self._abandoned:
+                return False
+            self._chunks.append(data)
+            self._cond.notify_all()
+            return True
+
+    def finish(self):
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+
+    def abandon(self):
+        with self._cond:
+            self._abandoned = True
+            self._chunks.clear()
+            self._cond.notify_all()
+
+    def readinto(self, b):
+        if not self._current:
+            with self._cond:
+                while not self._chunks and not self._eof:
+                    self._cond.wait()
+                if not self._chunks:
+                    return 0
+                self._current = memoryview(self._chunks.popleft())
+                self._cond.notify_all()
+        n = min(len(b), len(self._current))
+        b[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+
+def _safe_path(dest_dir: str, name: str) -> str:
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or name.startswith(("/", "\\")) or ".." in parts or ":" in parts[0]:
+        raise ArchiveFormatError(f"Unsafe path in archive: {name!r}")
+    return os.path.join(dest_dir, *parts)
+
+
+class _Extractor:
+    def __init__(self, dest_dir: str, max_entry_size: int, max_total_size: int, max_entries: int):
+        self.dest_dir = dest_dir
+        self.max_entry_size = max_entry_size
+        self.max_total_size = max_total_size
+        self.max_entries = max_entries
+        self.total = 0
+        self.entries = 0
+        self.paths: List[str] = []
+        self._seen = set()
+
+    def _count_entry(self):
+        # Directories count too, or an archive of empty directories would be unbounded
+        self.entries += 1
+        if self.entries > self.max_entries:
+            raise ArchiveLimitError(f"Archive has more than {self.max_entries} entries")
+
+    def add_dir(self, name: str):
+        self._count_entry()
+        target = _safe_path(self.dest_dir, name)
+        try:
+            os.makedirs(target, exist_ok=True)
+        except (FileExistsError, NotADirectoryError):
+            raise ArchiveFormatError(f"Conflicting path in archive: {name!r}")
+
+    def add_file(self, name: str, declared_size: int, source, mtime=None):
+        self._count_entry()
+        if declared_size > self.max_entry_size:
+            raise ArchiveLimitError(f"Archive entry too large: {name}")
+        target = _safe_path(self.dest_dir, name)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            f = open(target, "wb")
+        except (FileExistsError, NotADirectoryError, IsADirectoryError):
+            raise ArchiveFormatError(f"Conflicting path in archive: {name!r}")
+        written = 0
+        with f:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                self.total += len(chunk)
+                if written > self.max_entry_size:
+                    raise ArchiveLimitError(f"Archive entry too large: {name}")
+                if self.total > self.max_total_size:
+                    raise ArchiveLimitError("Archive total size limit exceeded")
+                f.write(chunk)
+        if mtime:
+            os.utime(target, (mtime, mtime))
+        # A repeated name overwrites the earlier entry, as with tar
+        path = os.path.relpath(target, self.dest_dir).replace(os.sep, "/")
+        if path not in self._seen:
+            self._seen.add(path)
+            self.paths.append(path)
+
+
+def extract_archive(fileobj, dest_dir: str, max_entry_size: int, max_total_size: int,
+                    max_entries: int = 10000) -> List[str]:
+    """Extract a zip, tar, tar.gz/bz2/xz or tar.zst stream into ``dest_dir``.
+
+    Only regular files and directories are extracted; links and devices are
+    skipped.  Returns the relative paths of the extracted files.  ``dest_dir``
+    should be a staging directory: on error it may hold a partial extraction.
+    """
+    reader = io.BufferedReader(fileobj, CHUNK_SIZE)
+    magic = reader.peek(4)[:4]
+    extractor = _Extractor(dest_dir, max_entry_size, max_total_size, max_entries)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    if magic in ZIP_MAGICS:
+        # The zip central directory sits at the end, so spool the compressed
+        # stream (within the same total budget) before reading entries
+        with tempfile.SpooledTemporaryFile(max_size=16 * CHUNK_SIZE, dir=dest_dir) as spool:
+            size = 0
+            while True:
+                chunk = reader.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_total_size:
+                    raise ArchiveLimitError("Archive total size limit exceeded")
+                spool.write(chunk)
+            spool.seek(0)
+            try:
+                with zipfile.ZipFile(spool) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir():
+                            extractor.add_dir(info.filename)
+                        else:
+                            with zf.open(info) as source:
+                                extractor.add_file(info.filename, info.file_size, source)
+            except zipfile.BadZipFile as e:
+                raise ArchiveFormatError(f"Invalid zip archive: {e}")
+        return extractor.paths
+
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ArchiveFormatError("tar.zst archives require the zstandard package")
+        stream, mode = zstandard.ZstdDecompressor().stream_reader(reader), "r|"
+    else:
+        stream, mode = reader, "r|*"
+    try:
+        with tarfile.open(fileobj=stream, mode=mode) as tar:
+            for member in tar:
+                if member.isdir():
+                    extractor.add_dir(member.name)
+                elif member.isfile():
+                    extractor.add_file(member.name, member.size, tar.extractfile(member), member.mtime)
+    except (tarfile.TarError, EOFError) as e:
+        raise ArchiveFormatError(f"Invalid tar archive: {e}")
+    return extractor.paths
+
+
+def install(staging_dir: str, dest_dir: str, paths: List[str], keep_newer: bool = False):
+    """Move extracted ``paths`` from ``staging_dir`` into ``dest_dir``.
+
+    Existing files are replaced rather than truncated, so files shared with a
+    forked session are left untouched on the other side.  With ``keep_newer``
+    an existing file that is newer than the extracted one is kept.
+    """
+    for path in paths:
+        source = os.path.join(staging_dir, path)
+        target = os.path.join(dest_dir, path)
+        if keep_newer and os.path.isfile(target) and os.stat(target).st_mtime > os.stat(source).st_mtime:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Staging is on another filesystem (e.g. a RAM workspace): copy next to the target, then swap
+            tmp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.{uuid.uuid4().hex}.tmp")
+            try:
+                shutil.copy2(source, tmp_path)
+                os.replace(tmp_path, target)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
@@ -0,0 +1,146 @@
+"""Cluster mode: consistent-hash ownership of sessions across replicas.
+
+Every replica is started with the same static peer list and its own URL.
+Sessions are owned by the replica that a consistent-hash ring over the
+*live* members maps their ``session_id`` to; requests that arrive elsewhere
+are forwarded to the owner.  A peer counts as live once it answers a
+health probe and as gone after ``failure_threshold`` failed probes in a row,
+so a single slow probe does not move sessions around.
+
+When membership changes, only the sessions whose owner changed move (about
+``1/N`` of them when a node joins), and the ring is the same on every
+replica that sees the same members.  The peer list can also be read from a
+file that is re-read on every refresh, so nodes can be added without
+restarting the others.
+"""
+
+import bisect
+import hashlib
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+VIRTUAL_NODES = 128
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+def normalize_url(url: str) -> str:
+    return url.strip().rstrip("/")
+
+
+def parse_peers(text: str) -> List[str]:
+    """Split a comma, space or newline separated list of peer URLs."""
+    return [normalize_url(peer) for peer in re.split(r"[,\s]+", text or "") if peer.strip()]
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes."""
+
+    def __init__(self, nodes: List[str], virtual_nodes: int = VIRTUAL_NODES):
+        self.nodes = sorted(set(nodes))
+        self._ring = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in self._ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class Membership:
+    """Track which configured peers are live and who owns each session."""
+
+    def __init__(self, self_url: str, peers: List[str], peers_file: Optional[str] = None,
+                 failure_threshold: int = 3):
+        self.self_url = normalize_url(self_url or "")
+        self.peers = peers
+        self.peers_file = peers_file
+        self.failure_threshold = failure_threshold
+        self.leaving = False
+        self._failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.ring = HashRing([self.self_url] if self.self_url else [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.self_url)
+
+    def configured_peers(self) -> List[str]:
+        """Peers from the static list and the peer file, excluding this node."""
+        peers = list(self.peers)
+        if self.peers_file:
+            try:
+                with open(self.peers_file) as f:
+                    peers += parse_peers(f.read())
+            except OSError:
+                pass
+        return sorted(set(peers) - {self.self_url})
+
+    def live_members(self) -> List[str]:
+        return self.ring.nodes
+
+    def live_peers(self) -> List[str]:
+        return [node for node in self.ring.nodes if node != self.self_url]
+
+    def update(self, probes: Dict[str, bool]) -> bool:
+        """Apply health probe results; returns whether the ring changed.
+
+        Peers missing from ``probes`` (no longer configured) are dropped.
+        """
+        with self._lock:
+            for peer in list(self._failures):
+                if peer not in probes:
+                    del self._failures[peer]
+            for peer, healthy in probes.items():
+                # Unknown peers start out as down until they answer
+                failures = self._failures.get(peer, self.failure_threshold)
+                self._failures[peer] = 0 if healthy else failures + 1
+            live = [peer for peer, failures in self._failures.items() if failures < self.failure_threshold]
+            if not self.leaving:
+                live.append(self.self_url)
+            if sorted(live) == self.ring.nodes:
+                return False
+            self.ring = HashRing(live)
+            return True
+
+    def leave(self):
+        """Stop owning sessions, e.g. before shutting down."""
+        with self._lock:
+            self.leaving = True
+            self.ring = HashRing(self.live_peers())
+
+    def owner(self, session_id: str) -> str:
+        return self.ring.owner(session_id) or self.self_url
+
+    def is_local(self, session_id: str) -> bool:
+        return not self.enabled or self.owner(session_id) == self.self_url
+
+    def new_session_id(self) -> str:
+        """A new session ID that this node owns, so it is created in place."""
+        session_id = str(uuid.uuid4())
+        if self.leaving:
+            return session_id
+        # Each try lands here with probability 1/N
+        for _ in range(1000):
+            if self.is_local(session_id):
+                break
+            session_id = str(uuid.uuid4())
+        return session_id
+
+    def status(self) -> dict:
+        return {
+            "self": self.self_url,
+            "leaving": self.leaving,
+            "members": self.live_members(),
+            "peers": {
+                peer: {"live": peer in self.ring.nodes, "failures": self._failures.get(peer, self.failure_threshold)}
+                for peer in self.configured_peers()
+            },
+        }
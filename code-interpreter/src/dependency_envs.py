@@ -0,0 +1,388 @@
+"""Pre-built dependency environments shared across sessions.
+
+A request may declare the Python or Node packages it needs.  Each distinct
+set of requirements is installed once, offline, from a local mirror into an
+environment layer keyed by the hash of the normalized set::
+
+    <root_dir>/<key>/env.json
+    <root_dir>/<key>/site-packages/     (Python, installed with pip --target)
+    <root_dir>/<key>/node_modules/      (Node, installed with npm --offline)
+
+Layers are built in a temporary sibling directory, made read-only and renamed
+into place, so they are never seen half-installed.  Python layers are put on
+``PYTHONPATH``; Node layers are linked into the session as ``node_modules``.
+Repeat requests for the same set reuse the layer without installing
+anything.  When the layers outgrow ``capacity`` bytes the least recently used
+ones that are not in use are removed.
+
+User code runs as root in the container, so the mode bits do not stop it
+from writing into a layer, for instance through the ``node_modules`` link.
+A fingerprint of the installed tree is therefore recorded at build time and
+checked by :meth:`DependencyEnvs.acquire`; a layer that no longer matches is
+discarded, once the runs still using it have finished, and rebuilt.  The
+fingerprint covers each entry's inode, size, mode and ctime, and ctime cannot
+be set back even by root, so a check only needs ``stat`` calls.  Every
+acquire checks the layer directory and its direct entries, which catches
+added, removed or renamed files in any top-level package; the walk over the
+whole tree, which also catches files rewritten in place, runs at most once
+per ``verify_interval`` seconds per layer.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from workspaces import tree_usage
+
+logger = logging.getLogger(__name__)
+
+METADATA_NAME = "env.json"
+
+PYTHON_LANGUAGES = ("py",)
+NODE_LANGUAGES = ("js", "ts")
+
+# Plain names with extras and version specifiers; anything that pip or npm
+# could treat as an option, a path or a URL is rejected
+PYTHON_REQUIREMENT = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*(\[[A-Za-z0-9._, -]+\])?[ ]*([<>=!~]=?[ ]*[A-Za-z0-9.*+!-]+[ ]*,?[ ]*)*$")
+NODE_REQUIREMENT = re.compile(r"^(@[a-z0-9][a-z0-9._-]*/)?[a-z0-9][a-z0-9._-]*(@[A-Za-z0-9.*^~<>=| -]+)?$")
+
+
+class DependencyError(ValueError):
+    """Raised for invalid requirements or when a layer cannot be built."""
+
+
+class DependencyLayer(NamedTuple):
+    key: str
+    kind: str
+    path: str
+
+
+def _kind(lang: str) -> str:
+    if lang in PYTHON_LANGUAGES:
+        return "python"
+    if lang in NODE_LANGUAGES:
+        return "node"
+    raise DependencyError(f"Dependencies are not supported for language: {lang}")
+
+
+def normalize(lang: str, requirements: List[str]) -> List[str]:
+    """Validate requirements and return them in a canonical order."""
+    kind = _kind(lang)
+    pattern = PYTHON_REQUIREMENT if kind == "python" else NODE_REQUIREMENT
+    normalized = set()
+    for requirement in requirements:
+        requirement = " ".join(requirement.split())
+        if kind == "python":
+            requirement = requirement.lower().replace("_", "-")
+        if not pattern.match(requirement):
+            raise DependencyError(f"Invalid requirement: {requirement!r}")
+        normalized.add(requirement)
+    if not normalized:
+        raise DependencyError("No requirements given")
+    return sorted(normalized)
+
+
+def environment_key(lang: str, requirements: List[str]) -> str:
+    kind = _kind(lang)
+    # Compiled wheels only fit the interpreter they were built for
+    runtime = f"python{sys.version_info[0]}.{sys.version_info[1]}" if kind == "python" else "node"
+    payload = json.dumps({"runtime": runtime, "requirements": normalize(lang, requirements)})
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _set_writable(path: str, writable: bool):
+    for root, dirs, names in os.walk(path):
+        for name in [root] + [os.path.join(root, n) for n in dirs + names]:
+            if os.path.islink(name):
+                continue
+            mode = os.lstat(name).st_mode
+            if writable:
+                os.chmod(name, mode | stat.S_IWUSR)
+            else:
+                os.chmod(name, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def tree_fingerprint(path: str, max_depth: Optional[int] = None) -> str:
+    """Digest of the metadata of every entry below ``path``; changes on any write.
+
+    With ``max_depth`` only entries at most that many levels below ``path``
+    are covered.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in [root] + [os.path.join(root, n) for n in sorted(names)] + [os.path.join(root, n) for n in dirs]:
+            st = os.lstat(name)
+            digest.update(f"{os.path.relpath(name, path)}\0{st.st_ino}\0{st.st_size}\0{st.st_mode}\0{st.st_ctime_ns}\n".encode())
+        depth = 0 if root == path else os.path.relpath(root, path).count(os.sep) + 1
+        if max_depth is not None and depth + 1 >= max_depth:
+            dirs.clear()
+    return digest.hexdigest()
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        _set_writable(path, True)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def link_node_modules(layer: DependencyLayer, session_dir: str):
+    """Point ``<session_dir>/node_modules`` at a Node layer.
+
+    A real ``node_modules`` directory uploaded by the user is left alone; the
+    layer is still reachable through ``NODE_PATH``.
+    """
+    link = os.path.join(session_dir, "node_modules")
+    if os.path.islink(link):
+        if os.readlink(link) == layer.path:
+            return
+        os.remove(link)
+    elif os.path.exists(link):
+        return
+    os.symlink(layer.path, link)
+
+
+class DependencyEnvs:
+    """Build, share and evict dependency layers."""
+
+    def __init__(self, root_dir: str, wheel_dir: str, npm_dir: str, capacity: int,
+                 build_timeout: int = 300, verify_interval: int = 60):
+        self.root_dir = root_dir
+        self.wheel_dir = wheel_dir
+        self.npm_dir = npm_dir
+        self.capacity = capacity
+        self.build_timeout = build_timeout
+        self.verify_interval = verify_interval
+        self._active: Dict[str, int] = {}
+        self._verified: Dict[str, float] = {}
+        self._discarding: Set[str] = set()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        os.makedirs(root_dir, exist_ok=True)
+        for name in os.listdir(root_dir):
+            # Leftovers of builds interrupted by a restart
+            if name.startswith("."):
+                _remove(os.path.join(root_dir, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root_dir, key)
+
+    def _layer(self, key: str, kind: str, path: Optional[str] = None) -> DependencyLayer:
+        return DependencyLayer(key, kind, os.path.join(path or self._path(key), "site-packages" if kind == "python" else "node_modules"))
+
+    def _build_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(key, threading.Lock())
+
+    def _try_acquire(self, key: str, kind: str) -> Optional[DependencyLayer]:
+        metadata_path = os.path.join(self._path(key), METADATA_NAME)
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return None
+        layer = self._layer(key, kind)
+        if not self._verify(key, layer.path, metadata):
+            self._discard(key)
+            return None
+        with self._lock:
+            while key in self._discarding:
+                self._idle.wait()
+            if not os.path.isfile(metadata_path):
+                return None
+            # The metadata mtime records the last use, so LRU order survives restarts
+            os.utime(metadata_path)
+            self._active[key] = self._active.get(key, 0) + 1
+            return layer
+
+    def _verify(self, key: str, path: str, metadata: dict) -> bool:
+        """Whether the layer at ``path`` still matches its build-time fingerprints."""
+        if metadata.get("entries_fingerprint") not in (None, tree_fingerprint(path, max_depth=1)):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            verified = self._verified.get(key)
+        if verified is not None and now - verified < self.verify_interval:
+            return True
+        if tree_fingerprint(path) != metadata.get("fingerprint"):
+            return False
+        with self._lock:
+            self._verified[key] = now
+        return True
+
+    def _discard(self, key: str):
+        """Drop a layer that was modified after it was built.
+
+        Runs still using the layer keep it until they finish; new requests for
+        it wait meanwhile and then build a fresh copy.
+        """
+        with self._lock:
+            if key in self._discarding:
+                while key in self._discarding:
+                    self._idle.wait()
+                return
+            self._discarding.add(key)
+            try:
+                if self._active.get(key):
+                    logger.warning(f"Dependency environment {key} was modified; "
+                                   f"rebuilding it once {self._active[key]} runs using it finish")
+                while self._active.get(key):
+                    self._idle.wait()
+                self._verified.pop(key, None)
+                trash = os.path.join(self.root_dir, f".{key}.modified-{uuid.uuid4().hex}")
+                try:
+                    os.rename(self._path(key), trash)
+                except FileNotFoundError:
+                    # Evicted in the meantime
+                    return
+            finally:
+                self._discarding.discard(key)
+                self._idle.notify_all()
+        logger.warning(f"Dependency environment {key} was modified after it was built; rebuilding it")
+        _remove(trash)
+
+    def acquire(self, lang: str, requirements: List[str]) -> DependencyLayer:
+        """Return the layer for ``requirements``, building it if needed.
+
+        The layer is protected from eviction until :meth:`release` is called.
+        """
+        kind = _kind(lang)
+        normalized = normalize(lang, requirements)
+        key = environment_key(lang, normalized)
+        layer = self._try_acquire(key, kind)
+        if layer is not None:
+            return layer
+        with self._build_lock(key):
+            layer = self._try_acquire(key, kind)
+            if layer is None:
+                self._build(key, kind, normalized)
+                layer = self._try_acquire(key, kind)
+        self.evict()
+        return layer
+
+    def release(self, layer: DependencyLayer):
+        with self._lock:
+            self._active[layer.key] -= 1
+            if not self._active[layer.key]:
+                del self._active[layer.key]
+                self._idle.notify_all()
+
+    def _build(self, key: str, kind: str, requirements: List[str]):
+        tmp_path = os.path.join(self.root_dir, f".{key}.build-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        started = time.time()
+        try:
+            if kind == "python":
+                command = self._pip_command(tmp_path, requirements)
+            else:
+                command = self._npm_command(tmp_path, requirements)
+            try:
+                result = subprocess.run(command, capture_output=True, text=True,
+                                        timeout=self.build_timeout, cwd=tmp_path)
+            except subprocess.TimeoutExpired:
+                raise DependencyError(f"Installing dependencies took longer than {self.build_timeout}s")
+            if result.returncode != 0:
+                output = (result.stderr or result.stdout).strip()
+                raise DependencyError(f"Could not install dependencies from the local mirror:\n{output[-2000:]}")
+            layer_path = self._layer(key, kind, tmp_path).path
+            os.makedirs(layer_path, exist_ok=True)
+            # The fingerprint is taken once the tree is final: chmod changes ctimes too
+            _set_writable(layer_path, False)
+            with open(os.path.join(tmp_path, METADATA_NAME), "w") as f:
+                json.dump({
+                    "key": key,
+                    "kind": kind,
+                    "requirements": requirements,
+                    "built_at": started,
+                    "build_seconds": round(time.time() - started, 3),
+                    "size": tree_usage(tmp_path),
+                    "fingerprint": tree_fingerprint(layer_path),
+                    "entries_fingerprint": tree_fingerprint(layer_path, max_depth=1),
+                }, f)
+            for name in [tmp_path] + [os.path.join(tmp_path, n) for n in os.listdir(tmp_path)]:
+                if name != layer_path and not os.path.islink(name):
+                    os.chmod(name, os.lstat(name).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+            os.rename(tmp_path, self._path(key))
+        except BaseException:
+            _remove(tmp_path)
+            raise
+
+    def _pip_command(self, tmp_path: str, requirements: List[str]) -> List[str]:
+        if not os.path.isdir(self.wheel_dir):
+            raise DependencyError("No wheel mirror is configured for Python dependencies")
+        requirements_path = os.path.join(tmp_path, "requirements.txt")
+        with open(requirements_path, "w") as f:
+            f.write("\n".join(requirements) + "\n")
+        return [
+            "python3", "-m", "pip", "install",
+            "--no-index", "--find-links", self.wheel_dir,
+            "--target", os.path.join(tmp_path, "site-packages"),
+            "--disable-pip-version-check", "--no-input", "--quiet",
+            "-r", requirements_path,
+        ]
+
+    def _npm_command(self, tmp_path: str, requirements: List[str]) -> List[str]:
+        if not os.path.isdir(self.npm_dir):
+            raise DependencyError("No npm mirror is configured for Node dependencies")
+        if not shutil.which("npm"):
+            raise DependencyError("npm is not installed")
+        with open(os.path.join(tmp_path, "package.json"), "w") as f:
+            json.dump({"name": "code-env", "private": True}, f)
+        return [
+            "npm", "install", "--offline", "--cache", self.npm_dir,
+            "--no-audit", "--no-fund", "--no-package-lock", "--ignore-scripts",
+            "--prefix", tmp_path,
+        ] + requirements
+
+    def environments(self) -> List[dict]:
+        environments = []
+        for key in os.listdir(self.root_dir):
+            metadata_path = os.path.join(self._path(key), METADATA_NAME)
+            if key.startswith(".") or not os.path.isfile(metadata_path):
+                continue
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            metadata["last_used"] = os.stat(metadata_path).st_mtime
+            metadata["in_use"] = self._active.get(key, 0)
+            environments.append(metadata)
+        return sorted(environments, key=lambda m: m["last_used"], reverse=True)
+
+    def evict(self) -> List[str]:
+        """Remove least recently used idle layers until usage fits ``capacity``."""
+        evicted = []
+        with self._lock:
+            environments = self.environments()
+            used = sum(m["size"] for m in environments)
+            for metadata in reversed(environments):
+                if used <= self.capacity:
+                    break
+                if self._active.get(metadata["key"]):
+                    continue
+                # Rename first so the layer disappears atomically for new requests
+                trash = os.path.join(self.root_dir, f".{metadata['key']}.evict-{uuid.uuid4().hex}")
+                os.rename(self._path(metadata["key"]), trash)
+                self._verified.pop(metadata["key"], None)
+                used -= metadata["size"]
+                evicted.append(trash)
+        for trash in evicted:
+            _remove(trash)
+        return [os.path.basename(trash)[1:].split(".")[0] for trash in evicted]
+
+    def stats(self) -> dict:
+        environments = self.environments()
+        return {
+            "capacity": self.capacity,
+            "used": sum(m["size"] for m in environments),
+            "environments": environments,
+        }
@@ -1,38 +1,148 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Query, Form, Header
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Query, Form, Header, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import os
 import uuid
 import subprocess
 import tempfile
 import shutil
 import hashlib
+import base64
 from datetime import datetime
 import json
 import logging
+import mimetypes
+from urllib.parse import quote
+
+import httpx
+
+import archives
+import cluster as cluster_mode
+import dependency_envs
+import profiling
+import session_fork
+import tiering
+import warmup
+import workspaces as workspace_store
+from runtime import session_data
+from semantic import SemanticModelError, evaluate_model, load_table, required_columns
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global peer_client
+    sweeper = asyncio.create_task(storage_sweeper()) if tiers.enabled or workspaces.enabled else None
+    monitor = None
+    if cluster.enabled:
+        peer_client = httpx.AsyncClient(timeout=httpx.Timeout(CLUSTER_TIMEOUT, read=None))
+        await refresh_membership()
+        monitor = asyncio.create_task(cluster_monitor())
+    warmer = asyncio.create_task(toolchains.run(warm_up_language)) if toolchains.languages else None
+    # Probe perf in the background so the first profiled run does not wait for it
+    perf_probe = asyncio.create_task(asyncio.to_thread(profiling.perf_available))
+    yield
+    perf_probe.cancel()
+    if warmer:
+        warmer.cancel()
+    if sweeper:
+        sweeper.cancel()
+    if monitor:
+        monitor.cancel()
+        if CLUSTER_DRAIN_ON_SHUTDOWN and cluster.live_peers():
+            # Hand every session to the remaining replicas before exiting
+            cluster.leave()
+            moved = await rebalance_sessions()
+            logger.info(f"Handed off {moved} sessions before shutdown")
+        await peer_client.aclose()
+
 app = FastAPI(
     title="LibreChat Code Interpreter API",
     description="API for sandbox code execution and file management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuration
-UPLOAD_DIR = "/tmp/code-exec/uploads"
-EXECUTION_DIR = "/tmp/code-exec/sessions"
+DATA_DIR = os.getenv("CODE_DATA_DIR", "/tmp/code-exec")
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+EXECUTION_DIR = os.path.join(DATA_DIR, "sessions")
+COLD_DIR = os.getenv("CODE_COLD_DIR", os.path.join(DATA_DIR, "cold"))
+PORT = int(os.getenv("PORT", "8700"))
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+MAX_ARCHIVE_SIZE = int(os.getenv("CODE_MAX_ARCHIVE_SIZE", str(1024 * 1024 * 1024)))  # 1GB extracted
+MAX_ARCHIVE_ENTRIES = int(os.getenv("CODE_MAX_ARCHIVE_ENTRIES", "10000"))
 API_KEY = os.getenv("CODE_API_KEY", "default-api-key")
+RUNTIME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime")
+FORK_MODE = os.getenv("CODE_FORK_MODE", "auto")
+INLINE_MAX_FILE_SIZE = int(os.getenv("CODE_INLINE_MAX_FILE_SIZE", str(256 * 1024)))  # 256KB
+INLINE_MAX_TOTAL_SIZE = int(os.getenv("CODE_INLINE_MAX_TOTAL_SIZE", str(1024 * 1024)))  # 1MB
+COLUMNAR_CACHE = os.getenv("CODE_COLUMNAR_CACHE", "true").lower() == "true"
+TIER_IDLE_SECONDS = int(os.getenv("CODE_TIER_IDLE_SECONDS", "3600"))  # 0 disables tiering
+TIER_SWEEP_INTERVAL = int(os.getenv("CODE_TIER_SWEEP_INTERVAL", "300"))
+WORKSPACE_MODE = os.getenv("CODE_WORKSPACE_MODE", "disk")  # "ram" keeps hot sessions on tmpfs
+RAM_DIR = os.getenv("CODE_RAM_DIR", "/dev/shm/code-exec/sessions")
+RAM_CAPACITY = int(os.getenv("CODE_RAM_CAPACITY", str(512 * 1024 * 1024)))  # 512MB
+RAM_SESSION_LIMIT = int(os.getenv("CODE_RAM_SESSION_LIMIT", str(64 * 1024 * 1024)))  # 64MB
+RAM_IDLE_SECONDS = int(os.getenv("CODE_RAM_IDLE_SECONDS", "300"))
+DEPENDENCY_ENV_DIR = os.getenv("CODE_DEPENDENCY_ENV_DIR", os.path.join(DATA_DIR, "envs"))
+DEPENDENCY_ENV_CAPACITY = int(os.getenv("CODE_DEPENDENCY_ENV_CAPACITY", str(4 * 1024 * 1024 * 1024)))  # 4GB
+DEPENDENCY_BUILD_TIMEOUT = int(os.getenv("CODE_DEPENDENCY_BUILD_TIMEOUT", "300"))
+DEPENDENCY_VERIFY_INTERVAL = int(os.getenv("CODE_DEPENDENCY_VERIFY_INTERVAL", "60"))
+WHEEL_MIRROR_DIR = os.getenv("CODE_WHEEL_MIRROR_DIR", "/opt/mirror/wheels")
+NPM_MIRROR_DIR = os.getenv("CODE_NPM_MIRROR_DIR", "/opt/mirror/npm")
+PROFILE_INTERVAL_MS = float(os.getenv("CODE_PROFILE_INTERVAL_MS", "5"))
+PROFILE_PERF_FREQUENCY = int(os.getenv("CODE_PROFILE_PERF_FREQUENCY", "499"))
+PROFILE_TOP_N = int(os.getenv("CODE_PROFILE_TOP_N", "15"))
+CLUSTER_SELF = os.getenv("CODE_CLUSTER_SELF", "")  # This node's URL; empty disables cluster mode
+CLUSTER_PEERS = os.getenv("CODE_CLUSTER_PEERS", "")
+CLUSTER_PEERS_FILE = os.getenv("CODE_CLUSTER_PEERS_FILE")
+CLUSTER_HEARTBEAT_INTERVAL = float(os.getenv("CODE_CLUSTER_HEARTBEAT_INTERVAL", "5"))
+CLUSTER_FAILURE_THRESHOLD = int(os.getenv("CODE_CLUSTER_FAILURE_THRESHOLD", "3"))
+CLUSTER_TIMEOUT = float(os.getenv("CODE_CLUSTER_TIMEOUT", "5"))
+CLUSTER_DRAIN_ON_SHUTDOWN = os.getenv("CODE_CLUSTER_DRAIN_ON_SHUTDOWN", "true").lower() == "true"
+CLUSTER_HEADER = "x-code-cluster"
+WARMUP_LANGUAGES = [lang.strip() for lang in os.getenv("CODE_WARMUP_LANGUAGES", ",".join(warmup.DEFAULT_LANGUAGES)).split(",") if lang.strip()]
 
 # Create directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(EXECUTION_DIR, exist_ok=True)
 
+workspaces = workspace_store.Workspaces(
+    EXECUTION_DIR,
+    RAM_DIR,
+    mode=WORKSPACE_MODE,
+    capacity=RAM_CAPACITY,
+    session_limit=RAM_SESSION_LIMIT,
+    idle_seconds=RAM_IDLE_SECONDS
+)
+tiers = tiering.SessionTiers(EXECUTION_DIR, COLD_DIR, idle_seconds=TIER_IDLE_SECONDS, on_remove=workspaces.forget)
+dependency_layers = dependency_envs.DependencyEnvs(
+    DEPENDENCY_ENV_DIR,
+    WHEEL_MIRROR_DIR,
+    NPM_MIRROR_DIR,
+    capacity=DEPENDENCY_ENV_CAPACITY,
+    build_timeout=DEPENDENCY_BUILD_TIMEOUT,
+    verify_interval=DEPENDENCY_VERIFY_INTERVAL
+)
+cluster = cluster_mode.Membership(
+    CLUSTER_SELF,
+    cluster_mode.parse_peers(CLUSTER_PEERS),
+    peers_file=CLUSTER_PEERS_FILE,
+    failure_threshold=CLUSTER_FAILURE_THRESHOLD
+)
+peer_client: Optional[httpx.AsyncClient] = None
+toolchains = warmup.Warmup(WARMUP_LANGUAGES)
+claim_locks: Dict[str, asyncio.Lock] = {}
+
 logger.info(f"Code Interpreter Service starting with API_KEY: {API_KEY[:5]}...")
 
 # Models
@@ -40,6 +150,10 @@ class FileRef(BaseModel):
     id: str
     name: str
     path: str
+    size: Optional[int] = None
+    contentType: Optional[str] = None
+    content: Optional[str] = None
+    encoding: Optional[str] = None
 
 class RequestFile(BaseModel):
     id: str
@@ -60,6 +174,10 @@ class RequestBody(BaseModel):
     user_id: Optional[str] = Field(None, description="Optional user identifier")
     entity_id: Optional[str] = Field(None, description="Optional assistant/agent identifier for file sharing and reference. Must be a valid nanoid-compatible string.", example="asst_axIyVEqAa3UVppsVP3WTl5So")
     files: Optional[List[RequestFile]] = Field(None, description="Array of file references to be used during execution")
+    inline_files: bool = Field(False, description="Embed small files generated by this run in the response instead of requiring a download")
+    inline_max_bytes: Optional[int] = Field(None, ge=0, description="Total inline content budget for this response, capped by the server limit")
+    profile: bool = Field(False, description="Run under a sampling profiler and return a flame graph and hotspot summary")
+    dependencies: Optional[List[str]] = Field(None, description="Python or npm requirements installed from the local mirror into a shared, cached environment", example=["pandas==2.2.3"])
 
 class FileObject(BaseModel):
     name: str
@@ -77,6 +195,43 @@ class UploadResponse(BaseModel):
     session_id: str
     files: List[FileObject]
 
+class AggregateRequest(BaseModel):
+    session_id: str = Field(..., description="Session holding the uploaded data file")
+    file: str = Field(..., description="Name of a CSV or Parquet file in the session", example="billing.csv")
+    semanticModel: Dict[str, Any] = Field(..., description="Semantic model with dimensions, measures and filters (see test_case/chart_schema.json)")
+    dimensions: Optional[List[str]] = Field(None, description="Subset of model dimensions to group by (default: all)")
+    measures: Optional[List[str]] = Field(None, description="Subset of model measures to return (default: all)")
+    filters: Optional[List[Dict[str, Any]]] = Field(None, description="Additional filters, same shape as the model filters")
+    order_by: Optional[List[str]] = Field(None, description="Sort fields, e.g. [\"date\"] or [\"extended_cost desc\"]")
+    limit: Optional[int] = Field(None, ge=0, description="Maximum number of rows to return")
+
+class AggregateResponse(BaseModel):
+    session_id: str
+    model: Optional[str] = None
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    row_count: int
+
+class ForkRequest(BaseModel):
+    entity_id: Optional[str] = Field(None, description="Optional identifier for the new session (default: a new UUID)")
+
+class ForkResponse(BaseModel):
+    message: str
+    session_id: str
+    parent_session_id: str
+    strategy: Dict[str, int]
+
+class EnvironmentRequest(BaseModel):
+    lang: str = Field(..., description="Language the environment is for: py, js or ts", example="py")
+    dependencies: List[str] = Field(..., description="Requirements to install from the local mirror", example=["pandas==2.2.3"])
+
+class EnvironmentResponse(BaseModel):
+    key: str
+    lang: str
+    dependencies: List[str]
+    build_seconds: Optional[float] = None
+    size: Optional[int] = None
+
 class Error(BaseModel):
     error: str
     details: Optional[str] = None
@@ -105,6 +260,362 @@ def get_file_info(file_path: str) -> dict:
         logger.error(f"Error getting file info for {file_path}: {e}")
         return {}
 
+def session_file_path(session_id: str, name: str) -> str:
+    """Path of ``name`` inside a session, rejecting names that escape the session directory."""
+    session_dir = os.path.realpath(os.path.join(EXECUTION_DIR, session_id))
+    file_path = os.path.realpath(os.path.join(session_dir, name))
+    if os.path.basename(session_id) != session_id or session_id in (".", "..") or \
+            file_path == session_dir or os.path.commonpath([session_dir, file_path]) != session_dir:
+        raise HTTPException(status_code=400, detail="Invalid file path")
+    # Unresolved, so it stays valid if a RAM session is spilled to disk
+    return os.path.join(EXECUTION_DIR, session_id, name)
+
+def build_columnar_cache(file_path: str):
+    try:
+        session_data.ensure_cache(file_path)
+        logger.info(f"Built columnar cache for {file_path}")
+    except Exception as e:
+        logger.warning(f"Could not build columnar cache for {file_path}: {e}")
+
+def execution_env(layer: Optional[dependency_envs.DependencyLayer] = None) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (RUNTIME_DIR, env.get("PYTHONPATH")) if p)
+    if layer is not None:
+        # Ahead of site-packages, so requested versions win over the image's
+        var = "PYTHONPATH" if layer.kind == "python" else "NODE_PATH"
+        env[var] = os.pathsep.join(p for p in (layer.path, env.get(var)) if p)
+        if layer.kind == "python":
+            # Bytecode written into the shared layer would fail its fingerprint check
+            env["PYTHONDONTWRITEBYTECODE"] = "1"
+    if workspaces.enabled:
+        # Keep compiler and runtime scratch files in RAM too
+        tmp_dir = os.path.join(RAM_DIR, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        env["TMPDIR"] = tmp_dir
+    return env
+
+@asynccontextmanager
+async def session_in_use(session_id: str):
+    """Keep a session hot and in place while a request writes to it.
+
+    The session is rehydrated first if it is cold, and is not archived or
+    spilled from RAM until the block exits.
+    """
+    if await asyncio.to_thread(tiers.acquire, session_id):
+        logger.info(f"Rehydrated cold session: {session_id}")
+    try:
+        await asyncio.to_thread(workspaces.acquire, session_id)
+    except BaseException:
+        tiers.release(session_id)
+        raise
+    try:
+        yield
+    finally:
+        workspaces.release(session_id)
+        tiers.release(session_id)
+
+async def storage_sweeper():
+    while True:
+        await asyncio.sleep(min(TIER_SWEEP_INTERVAL, RAM_IDLE_SECONDS) if workspaces.enabled else TIER_SWEEP_INTERVAL)
+        try:
+            spilled = await asyncio.to_thread(workspaces.rebalance)
+            if spilled:
+                logger.info(f"Spilled {spilled} RAM sessions to disk")
+        except Exception as e:
+            logger.error(f"Error during RAM workspace rebalance: {e}")
+        try:
+            archived = await asyncio.to_thread(tiers.sweep)
+            if archived:
+                logger.info(f"Moved {len(archived)} idle sessions to cold storage")
+        except Exception as e:
+            logger.error(f"Error during session tiering sweep: {e}")
+
+def cold_file_info(entry: dict) -> dict:
+    return {
+        "name": entry["name"],
+        "size": entry["size"],
+        "lastModified": datetime.fromtimestamp(entry["mtime"]).isoformat(),
+        "etag": hashlib.md5(str(entry["mtime"]).encode()).hexdigest()
+    }
+
+def snapshot_files(session_dir: str) -> Dict[str, tuple]:
+    """Identity of each top-level file, to tell which files a run wrote."""
+    snapshot = {}
+    for name in os.listdir(session_dir):
+        try:
+            stat = os.stat(os.path.join(session_dir, name))
+        except OSError:
+            continue
+        snapshot[name] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    return snapshot
+
+def inline_generated_files(session_dir: str, files: List[FileRef], before: Dict[str, tuple], budget: int):
+    """Embed files that are new or changed since ``before`` into ``files``, smallest first, within ``budget`` bytes."""
+    candidates = []
+    for file_ref in files:
+        stat = os.stat(os.path.join(session_dir, file_ref.name))
+        file_ref.size = stat.st_size
+        file_ref.contentType = mimetypes.guess_type(file_ref.name)[0] or "application/octet-stream"
+        written = before.get(file_ref.name) != (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if written and stat.st_size <= INLINE_MAX_FILE_SIZE:
+            candidates.append(file_ref)
+    
+    for file_ref in sorted(candidates, key=lambda f: f.size):
+        with open(os.path.join(session_dir, file_ref.name), "rb") as f:
+            data = f.read()
+        is_text = file_ref.contentType.startswith("text/") or file_ref.contentType in (
+            "application/json", "application/xml", "image/svg+xml", "application/javascript"
+        )
+        content = None
+        if is_text:
+            try:
+                content, encoding = data.decode("utf-8"), "utf-8"
+            except UnicodeDecodeError:
+                pass
+        if content is None:
+            content, encoding = base64.b64encode(data).decode("ascii"), "base64"
+        if len(content) > budget:
+            break
+        budget -= len(content)
+        file_ref.content = content
+        file_ref.encoding = encoding
+
+def extract_from_pipe(pipe: archives.ChunkPipe, staging_dir: str) -> List[str]:
+    try:
+        return archives.extract_archive(
+            pipe,
+            staging_dir,
+            max_entry_size=MAX_FILE_SIZE,
+            max_total_size=MAX_ARCHIVE_SIZE,
+            max_entries=MAX_ARCHIVE_ENTRIES
+        )
+    finally:
+        # Unblock the request reader if extraction stopped early
+        pipe.abandon()
+
+def session_archive_entries(session_id: str) -> List[archives.ArchiveEntry]:
+    if tiers.is_cold(session_id):
+        return [
+            archives.ArchiveEntry(path, entry["size"], entry["mtime"],
+                                  lambda path=path: tiers.iter_cold_file(session_id, path))
+            for path, entry in tiers.manifest(session_id).items()
+        ]
+    session_dir = os.path.join(EXECUTION_DIR, session_id)
+    entries = []
+    for root, dirs, names in os.walk(session_dir):
+        dirs[:] = sorted(d for d in dirs if d != session_data.CACHE_DIRNAME)
+        for name in sorted(names):
+            file_path = os.path.join(root, name)
+            if os.path.islink(file_path) or not os.path.isfile(file_path):
+                continue
+            stat = os.stat(file_path)
+            entries.append(archives.ArchiveEntry(
+                os.path.relpath(file_path, session_dir).replace(os.sep, "/"),
+                stat.st_size,
+                stat.st_mtime,
+                lambda file_path=file_path: archives.iter_file(file_path)
+            ))
+    return entries
+
+async def receive_archive(session_id: str, chunks, keep_newer: bool = False) -> List[str]:
+    """Extract an archive arriving as ``chunks`` into a session; returns the extracted paths."""
+    session_dir = os.path.join(EXECUTION_DIR, session_id)
+    staging_dir = os.path.join(EXECUTION_DIR, f".{session_id}.extract-{uuid.uuid4().hex}")
+    try:
+        # Extract in a worker thread while the body is still being received
+        pipe = archives.ChunkPipe()
+        extraction = asyncio.ensure_future(asyncio.to_thread(extract_from_pipe, pipe, staging_dir))
+        try:
+            async for chunk in chunks:
+                if not await asyncio.to_thread(pipe.feed, chunk):
+                    break
+        finally:
+            pipe.finish()
+        paths = await extraction
+        
+        async with session_in_use(session_id):
+            workspaces.ensure(session_id)
+            await asyncio.to_thread(archives.install, staging_dir, session_dir, paths, keep_newer=keep_newer)
+        await asyncio.to_thread(workspaces.measure, session_id)
+        return paths
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+# Cluster mode
+def new_session_id() -> str:
+    return cluster.new_session_id() if cluster.enabled else str(uuid.uuid4())
+
+def cluster_headers(kind: str) -> Dict[str, str]:
+    return {"x-api-key": API_KEY, CLUSTER_HEADER: kind}
+
+def session_url(node: str, path: str, session_id: str) -> str:
+    return f"{node}{path}/{quote(session_id, safe='')}"
+
+HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "te", "upgrade", "proxy-connection"}
+
+async def forward_request(request: Request, owner: str, files=None, data=None):
+    """Proxy ``request`` to ``owner`` and stream its response back."""
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    headers[CLUSTER_HEADER] = "forwarded"
+    url = owner + request.url.path
+    if files is not None:
+        # The multipart body was already parsed, so it is rebuilt from the spooled files
+        headers = {k: v for k, v in headers.items() if k.lower() not in ("content-type", "content-length")}
+        upstream_request = peer_client.build_request(request.method, url, params=request.query_params,
+                                                     headers=headers, files=files, data=data)
+    else:
+        content = request.stream() if request.method not in ("GET", "HEAD", "DELETE") else None
+        upstream_request = peer_client.build_request(request.method, url, params=request.query_params,
+                                                     headers=headers, content=content)
+    try:
+        upstream = await peer_client.send(upstream_request, stream=True)
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # Nothing reached the owner, so the client may safely retry
+        logger.error(f"Could not forward {request.url.path} to {owner}: {e}")
+        raise HTTPException(status_code=503, detail=f"Session owner {owner} is unavailable")
+    except httpx.TransportError as e:
+        # The owner may already have run the request; a 503 would invite a retry
+        logger.error(f"Forwarded {request.url.path} to {owner} failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Session owner {owner} failed while handling the request")
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS},
+        background=BackgroundTask(upstream.aclose)
+    )
+
+async def route_session(request: Request, session_id: Optional[str], files=None, data=None):
+    """Forward a request for ``session_id`` to the replica that owns it.
+
+    Returns ``None`` when this replica should handle the request itself.
+    """
+    if not cluster.enabled or not session_id:
+        return None
+    kind = request.headers.get(CLUSTER_HEADER)
+    if kind in ("transfer", "local"):
+        return None
+    owner = cluster.owner(session_id)
+    if owner == cluster.self_url:
+        await claim_session(session_id)
+        return None
+    if kind == "forwarded":
+        # The sender has a different view of the ring; serve locally rather than loop
+        return None
+    logger.info(f"Forwarding {request.method} {request.url.path} to {owner}")
+    return await forward_request(request, owner, files=files, data=data)
+
+async def claim_session(session_id: str):
+    """Pull a session this node owns from the peer that still holds it, if any."""
+    if tiers.exists(session_id):
+        return
+    lock = claim_locks.setdefault(session_id, asyncio.Lock())
+    async with lock:
+        try:
+            if tiers.exists(session_id):
+                return
+            for peer in cluster.live_peers():
+                try:
+                    async with peer_client.stream(
+                        "GET",
+                        session_url(peer, "/archive", session_id),
+                        params={"format": "tar"},
+                        headers=cluster_headers("transfer")
+                    ) as response:
+                        if response.status_code == 404:
+                            continue
+                        response.raise_for_status()
+                        paths = await receive_archive(session_id, response.aiter_bytes(), keep_newer=True)
+                    await peer_client.delete(session_url(peer, "/cluster/sessions", session_id),
+                                             headers=cluster_headers("transfer"))
+                    logger.info(f"Pulled session {session_id} ({len(paths)} files) from {peer}")
+                    return
+                except (httpx.HTTPError, archives.ArchiveFormatError) as e:
+                    logger.warning(f"Could not pull session {session_id} from {peer}: {e}")
+        finally:
+            claim_locks.pop(session_id, None)
+
+async def hand_off_session(session_id: str, target: str) -> bool:
+    """Push a local session to ``target`` and delete it here once accepted.
+
+    A session that is in use, or is used while it is transferred, is kept and
+    ``False`` returned; the next heartbeat tries again, and the new owner keeps
+    whichever copy of each file is newer.
+    """
+    if tiers.in_use(session_id):
+        return False
+    last_access = tiers.last_access(session_id)
+    transfer_format = "tar.zst" if archives.zstandard is not None else "tar"
+    entries = await asyncio.to_thread(session_archive_entries, session_id)
+    response = await peer_client.post(
+        session_url(target, "/cluster/sessions", session_id),
+        content=iterate_in_threadpool(archives.iter_archive(entries, transfer_format)),
+        headers=cluster_headers("transfer")
+    )
+    response.raise_for_status()
+    return await asyncio.to_thread(tiers.remove_if_unused, session_id, last_access)
+
+async def rebalance_sessions() -> int:
+    """Hand off every local session owned by another node; returns how many moved."""
+    moved = 0
+    for session_id in await asyncio.to_thread(tiers.session_ids):
+        owner = cluster.owner(session_id)
+        if owner == cluster.self_url:
+            continue
+        try:
+            if await hand_off_session(session_id, owner):
+                moved += 1
+            else:
+                logger.info(f"Session {session_id} is in use; handing it off to {owner} later")
+        except Exception as e:
+            logger.warning(f"Could not hand off session {session_id} to {owner}: {e}")
+    return moved
+
+async def probe_peer(peer: str) -> bool:
+    try:
+        # Peers only take sessions once warmed up, and stop while draining
+        response = await peer_client.get(f"{peer}/ready", timeout=CLUSTER_TIMEOUT)
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+async def refresh_membership():
+    peers = cluster.configured_peers()
+    results = await asyncio.gather(*(probe_peer(peer) for peer in peers))
+    if cluster.update(dict(zip(peers, results))):
+        logger.info(f"Cluster membership changed: {cluster.live_members()}")
+
+async def cluster_monitor():
+    while True:
+        await asyncio.sleep(CLUSTER_HEARTBEAT_INTERVAL)
+        try:
+            await refresh_membership()
+            moved = await rebalance_sessions()
+            if moved:
+                logger.info(f"Handed off {moved} sessions to their new owners")
+        except Exception as e:
+            logger.error(f"Error during cluster membership refresh: {e}")
+
+async def warm_up_language(lang: str, code: str) -> Tuple[bool, str]:
+    """Run a warm-up snippet through ``/exec`` in a throwaway local session."""
+    session_id = f".warmup-{lang}"
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://warmup") as client:
+            response = await client.post(
+                "/exec",
+                json={"code": code, "lang": lang, "entity_id": session_id},
+                headers={"x-api-key": API_KEY, CLUSTER_HEADER: "local"},
+                timeout=None
+            )
+    finally:
+        await asyncio.to_thread(tiers.remove, session_id)
+    if response.status_code != 200:
+        return False, response.text
+    run = response.json()["run"]
+    if run["code"] != 0:
+        return False, (run["stderr"] or run["stdout"]).strip()[-500:]
+    logger.info(f"Warmed up {lang}")
+    return True, ""
+
 def cleanup_execution_dir(session_dir: str):
     try:
         if os.path.exists(session_dir):
@@ -113,10 +624,14 @@ def cleanup_execution_dir(session_dir: str):
         logger.error(f"Error cleaning up execution directory {session_dir}: {e}")
 
 # Endpoints
-@app.post("/exec", response_model=ExecuteResponse, responses={401: {"model": Error}, 503: {"model": Error}})
-async def execute_code(body: RequestBody, api_key: str = Depends(verify_api_key)):
+@app.post("/exec", response_model=ExecuteResponse, responses={401: {"model": Error}, 502: {"model": Error}, 503: {"model": Error}})
+async def execute_code(body: RequestBody, request: Request, api_key: str = Depends(verify_api_key)):
     logger.info(f"Executing code in language: {body.lang}")
     
+    forwarded = await route_session(request, body.entity_id)
+    if forwarded is not None:
+        return forwarded
+    
     try:
         code = body.code
         lang = body.lang
@@ -129,122 +644,179 @@ async def execute_code(body: RequestBody, api_key: str = Depends(verify_api_key)
             raise HTTPException(status_code=400, detail="Missing required parameters: code and lang")
         
         # Generate session ID
-        session_id = entity_id or str(uuid.uuid4())
+        session_id = entity_id or new_session_id()
         session_dir = os.path.join(EXECUTION_DIR, session_id)
-        
-        # Create session directory
-        os.makedirs(session_dir, exist_ok=True)
-        
-        # Copy uploaded files to session directory
-        for file_ref in files:
-            source_path = os.path.join(UPLOAD_DIR, file_ref.name)
-            dest_path = os.path.join(session_dir, file_ref.name)
+        async with session_in_use(session_id):
+            # Create session directory
+            workspaces.ensure(session_id)
             
-            if os.path.exists(source_path):
-                shutil.copy2(source_path, dest_path)
-        
-        # Write code to file
-        file_ext = ""
-        if lang == "py":
-            file_ext = ".py"
-        elif lang == "js":
-            file_ext = ".js"
-        elif lang == "ts":
-            file_ext = ".ts"
-        elif lang == "c":
-            file_ext = ".c"
-        elif lang == "cpp":
-            file_ext = ".cpp"
-        elif lang == "java":
-            file_ext = ".java"
-        elif lang == "php":
-            file_ext = ".php"
-        elif lang == "rs":
-            file_ext = ".rs"
-        elif lang == "go":
-            file_ext = ".go"
-        elif lang == "d":
-            file_ext = ".d"
-        elif lang == "f90":
-            file_ext = ".f90"
-        elif lang == "r":
-            file_ext = ".R"
-        else:
-            file_ext = ".txt"
-        
-        code_filename = f"code{file_ext}"
-        code_filepath = os.path.join(session_dir, code_filename)
-        
-        with open(code_filepath, "w") as f:
-            f.write(code)
-        
-        # Prepare execution command based on language
-        command = ""
-        timeout = 30  # 30 seconds
-        
-        if lang == "py":
-            command = f"cd {session_dir} && python3 {code_filename}"
-        elif lang == "js":
-            command = f"cd {session_dir} && node {code_filename}"
-        elif lang == "ts":
-            # First compile TypeScript, then run
-            command = f"cd {session_dir} && npx tsc {code_filename} && node {code_filename.replace('.ts', '.js')}"
-        elif lang == "c":
-            command = f"cd {session_dir} && gcc {code_filename} -o program && ./program"
-        elif lang == "cpp":
-            command = f"cd {session_dir} && g++ {code_filename} -o program && ./program"
-        elif lang == "java":
-            command = f"cd {session_dir} && javac {code_filename} && java {code_filename.replace('.java', '')}"
-        elif lang == "php":
-            command = f"cd {session_dir} && php {code_filename}"
-        elif lang == "go":
-            command = f"cd {session_dir} && go run {code_filename}"
-        elif lang == "r":
-            command = f"cd {session_dir} && Rscript {code_filename}"
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported language: {lang}")
-        
-        # Add arguments if provided
-        if args:
-            command += f" {args}"
+            # Un-share files hard-linked with a forked session before code can write to them
+            detached = await asyncio.to_thread(session_fork.detach_session, session_dir)
+            if detached:
+                logger.info(f"Detached {detached} shared files in session: {session_id}")
+            
+            # Copy uploaded files to session directory
+            for file_ref in files:
+                source_path = os.path.join(UPLOAD_DIR, file_ref.name)
+                dest_path = os.path.join(session_dir, file_ref.name)
+                
+                if os.path.exists(source_path):
+                    shutil.copy2(source_path, dest_path)
+            
+            # Write code to file
+            file_ext = ""
+            if lang == "py":
+                file_ext = ".py"
+            elif lang == "js":
+                file_ext = ".js"
+            elif lang == "ts":
+                file_ext = ".ts"
+            elif lang == "c":
+                file_ext = ".c"
+            elif lang == "cpp":
+                file_ext = ".cpp"
+            elif lang == "java":
+                file_ext = ".java"
+            elif lang == "php":
+                file_ext = ".php"
+            elif lang == "rs":
+                file_ext = ".rs"
+            elif lang == "go":
+                file_ext = ".go"
+            elif lang == "d":
+                file_ext = ".d"
+            elif lang == "f90":
+                file_ext = ".f90"
+            elif lang == "r":
+                file_ext = ".R"
+            else:
+                file_ext = ".txt"
+            
+            code_filename = f"code{file_ext}"
+            code_filepath = os.path.join(session_dir, code_filename)
+            
+            with open(code_filepath, "w") as f:
+                f.write(code)
+            
+            # Prepare execution command based on language
+            command = ""
+            timeout = 30  # 30 seconds
+            # The first check for perf runs a probe, which can take seconds
+            profile = body.profile and await asyncio.to_thread(profiling.supported, lang)
+            perf = profiling.perf_prefix(PROFILE_PERF_FREQUENCY) if profile and lang in profiling.PERF_LANGUAGES else ""
+            if profile:
+                for name in (profiling.COLLAPSED_NAME, profiling.FLAMEGRAPH_NAME):
+                    if os.path.exists(os.path.join(session_dir, name)):
+                        os.remove(os.path.join(session_dir, name))
+            
+            if lang == "py" and profile:
+                # Stop sampling just before the timeout so long runs still get a profile
+                command = (
+                    f"cd {session_dir} && python3 -m sampling_profiler --output {profiling.COLLAPSED_NAME} "
+                    f"--interval {PROFILE_INTERVAL_MS / 1000} --deadline {timeout - 2} {code_filename}"
+                )
+            elif lang == "py":
+                command = f"cd {session_dir} && python3 {code_filename}"
+            elif lang == "js":
+                command = f"cd {session_dir} && node {code_filename}"
+            elif lang == "ts":
+                # First compile TypeScript, then run
+                command = f"cd {session_dir} && npx tsc {code_filename} && node {code_filename.replace('.ts', '.js')}"
+            elif lang == "c":
+                command = f"cd {session_dir} && gcc {code_filename} -o program && {perf}./program"
+            elif lang == "cpp":
+                command = f"cd {session_dir} && g++ {code_filename} -o program && {perf}./program"
+            elif lang == "java":
+                command = f"cd {session_dir} && javac {code_filename} && java {code_filename.replace('.java', '')}"
+            elif lang == "php":
+                command = f"cd {session_dir} && php {code_filename}"
+            elif lang == "go" and profile:
+                command = f"cd {session_dir} && go build -o program {code_filename} && {perf}./program"
+            elif lang == "go":
+                command = f"cd {session_dir} && go run {code_filename}"
+            elif lang == "r":
+                command = f"cd {session_dir} && Rscript {code_filename}"
+            else:
+                raise HTTPException(status_code=400, detail=f"Unsupported language: {lang}")
+            
+            # Add arguments if provided
+            if args:
+                command += f" {args}"
+            
+            # Resolve declared dependencies to a shared pre-built environment
+            layer = None
+            if body.dependencies:
+                try:
+                    layer = await asyncio.to_thread(dependency_layers.acquire, lang, body.dependencies)
+                except dependency_envs.DependencyError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            
+            # Execute code
+            logger.info(f"Executing command: {command}")
+            # Input files uploaded just before the run are not "generated"
+            files_before = snapshot_files(session_dir) if body.inline_files else {}
+            try:
+                if layer is not None and layer.kind == "node":
+                    dependency_envs.link_node_modules(layer, session_dir)
+                # In a worker thread, so health probes and other requests are served meanwhile
+                result = await asyncio.to_thread(
+                    subprocess.run,
+                    command,
+                    shell=True,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    cwd=session_dir,
+                    env=execution_env(layer)
+                )
+                stdout = result.stdout
+                stderr = result.stderr
+                code_result = result.returncode
+                signal = None
+            except subprocess.TimeoutExpired as e:
+                stdout = e.stdout.decode() if e.stdout else ""
+                stderr = (e.stderr.decode() if e.stderr else "") + "\nExecution timed out"
+                code_result = 1
+                signal = "SIGTERM"
+            except Exception as e:
+                stdout = ""
+                stderr = str(e)
+                code_result = 1
+                signal = None
+            finally:
+                if layer is not None:
+                    dependency_layers.release(layer)
+            tiers.touch(session_id)
+            
+            # Build the flame graph before listing files so it is returned too
+            profile_summary = None
+            if profile:
+                try:
+                    profile_summary = await asyncio.to_thread(profiling.finalize, session_dir, lang, PROFILE_TOP_N)
+                except Exception as e:
+                    logger.warning(f"Could not build profile for session {session_id}: {e}")
+                    profile_summary = {"status": "failed", "message": str(e)}
+            elif body.profile:
+                profile_summary = {"status": "unsupported", "message": f"Profiling is not available for language: {lang}"}
+            
+            # Get generated files
+            generated_files = []
+            for file in os.listdir(session_dir):
+                if file != code_filename:
+                    file_path = os.path.join(session_dir, file)
+                    if os.path.isfile(file_path):
+                        generated_files.append(FileRef(
+                            id=str(uuid.uuid4()),
+                            name=file,
+                            path=f"/download/{session_id}/{file}"
+                        ))
+            
+            if body.inline_files:
+                budget = min(body.inline_max_bytes if body.inline_max_bytes is not None else INLINE_MAX_TOTAL_SIZE, INLINE_MAX_TOTAL_SIZE)
+                inline_generated_files(session_dir, generated_files, files_before, budget)
         
-        # Execute code
-        logger.info(f"Executing command: {command}")
-        try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=session_dir
-            )
-            stdout = result.stdout
-            stderr = result.stderr
-            code_result = result.returncode
-            signal = None
-        except subprocess.TimeoutExpired as e:
-            stdout = e.stdout.decode() if e.stdout else ""
-            stderr = (e.stderr.decode() if e.stderr else "") + "\nExecution timed out"
-            code_result = 1
-            signal = "SIGTERM"
-        except Exception as e:
-            stdout = ""
-            stderr = str(e)
-            code_result = 1
-            signal = None
-        
-        # Get generated files
-        generated_files = []
-        for file in os.listdir(session_dir):
-            if file != code_filename:
-                file_path = os.path.join(session_dir, file)
-                if os.path.isfile(file_path):
-                    generated_files.append(FileRef(
-                        id=str(uuid.uuid4()),
-                        name=file,
-                        path=f"/download/{session_id}/{file}"
-                    ))
+        # Spill to disk if the run grew a RAM workspace past its limit
+        await asyncio.to_thread(workspaces.measure, session_id)
         
         # Prepare response
         response = ExecuteResponse(
@@ -257,7 +829,8 @@ async def execute_code(body: RequestBody, api_key: str = Depends(verify_api_key)
                 "message": None,
                 "status": None,
                 "cpu_time": None,
-                "wall_time": None
+                "wall_time": None,
+                **({"profile": profile_summary} if profile_summary else {})
             },
             language=lang,
             version="1.0.0",
@@ -267,57 +840,78 @@ async def execute_code(body: RequestBody, api_key: str = Depends(verify_api_key)
         
         logger.info(f"Code execution completed with exit code: {code_result}")
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during code execution: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/upload", response_model=UploadResponse, responses={413: {"model": Error}})
 async def upload_files(
+    request: Request,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     entity_id: Optional[str] = Form(None),
     api_key: str = Depends(verify_api_key)
 ):
     logger.info(f"Uploading {len(files)} files")
     
+    forwarded = await route_session(
+        request,
+        entity_id,
+        files=[("files", (file.filename, file.file, file.content_type)) for file in files],
+        data={"entity_id": entity_id}
+    )
+    if forwarded is not None:
+        return forwarded
+    
     try:
-        session_id = entity_id or str(uuid.uuid4())
+        session_id = entity_id or new_session_id()
         session_dir = os.path.join(EXECUTION_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
-        
-        uploaded_files = []
-        
-        for file in files:
-            # Check file size
-            contents = await file.read()
-            if len(contents) > MAX_FILE_SIZE:
-                raise HTTPException(status_code=413, detail="File size limit exceeded")
+        async with session_in_use(session_id):
+            workspaces.ensure(session_id)
             
-            # Reset file pointer
-            await file.seek(0)
+            uploaded_files = []
             
-            # Save file
-            file_path = os.path.join(session_dir, file.filename)
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            
-            # Get file info
-            file_info = get_file_info(file_path)
-            if file_info:
-                uploaded_files.append(FileObject(
-                    name=file.filename,
-                    id=str(uuid.uuid4()),
-                    session_id=session_id,
-                    content=None,  # We don't include content in the response for security
-                    size=file_info.get("size"),
-                    lastModified=file_info.get("lastModified"),
-                    etag=file_info.get("etag"),
-                    metadata={
-                        "content-type": file.content_type,
-                        "original-filename": file.filename
-                    },
-                    contentType=file.content_type
-                ))
+            for file in files:
+                # Check file size
+                contents = await file.read()
+                if len(contents) > MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail="File size limit exceeded")
+                
+                # Reset file pointer
+                await file.seek(0)
+                
+                # Save file, replacing rather than truncating an inode a fork may share
+                file_path = os.path.join(session_dir, file.filename)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                with open(file_path, "wb") as f:
+                    shutil.copyfileobj(file.file, f)
+                
+                # Convert tabular files to the columnar cache after responding
+                if COLUMNAR_CACHE and session_data.is_convertible(file_path):
+                    background_tasks.add_task(build_columnar_cache, file_path)
+                
+                # Get file info
+                file_info = get_file_info(file_path)
+                if file_info:
+                    uploaded_files.append(FileObject(
+                        name=file.filename,
+                        id=str(uuid.uuid4()),
+                        session_id=session_id,
+                        content=None,  # We don't include content in the response for security
+                        size=file_info.get("size"),
+                        lastModified=file_info.get("lastModified"),
+                        etag=file_info.get("etag"),
+                        metadata={
+                            "content-type": file.content_type,
+                            "original-filename": file.filename
+                        },
+                        contentType=file.content_type
+                    ))
         
+        await asyncio.to_thread(workspaces.measure, session_id)
         logger.info(f"Successfully uploaded {len(uploaded_files)} files")
         return UploadResponse(
             message="Files uploaded successfully",
@@ -328,46 +922,207 @@ async def upload_files(
         logger.error(f"Error during file upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/sessions/{session_id}/fork", response_model=ForkResponse, responses={404: {"model": Error}, 409: {"model": Error}})
+async def fork_session(
+    session_id: str,
+    request: Request,
+    body: Optional[ForkRequest] = None,
+    api_key: str = Depends(verify_api_key)
+):
+    logger.info(f"Forking session: {session_id}")
+    
+    forwarded = await route_session(request, session_id)
+    if forwarded is not None:
+        return forwarded
+    
+    try:
+        session_dir = os.path.join(EXECUTION_DIR, session_id)
+        async with session_in_use(session_id):
+            if not os.path.isdir(session_dir):
+                raise HTTPException(status_code=404, detail="Session not found")
+            
+            fork_id = (body.entity_id if body else None) or new_session_id()
+            if os.path.basename(fork_id) != fork_id or fork_id in (".", ".."):
+                raise HTTPException(status_code=400, detail="Invalid entity_id")
+            
+            # Also refuse the ID of an archived session, which has no hot directory
+            if tiers.exists(fork_id):
+                raise HTTPException(status_code=409, detail="Session already exists")
+            try:
+                # Linking or copying every file takes a while on large sessions
+                strategy = await asyncio.to_thread(workspaces.fork, session_id, fork_id, mode=FORK_MODE)
+            except FileExistsError:
+                raise HTTPException(status_code=409, detail="Session already exists")
+        
+        # A named fork may belong to another replica: clone locally, then hand it over
+        if not cluster.is_local(fork_id):
+            await hand_off_session(fork_id, cluster.owner(fork_id))
+        
+        logger.info(f"Forked session {session_id} into {fork_id}: {strategy}")
+        return ForkResponse(
+            message="Session forked successfully",
+            session_id=fork_id,
+            parent_session_id=session_id,
+            strategy=strategy
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error forking session: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/upload/archive", response_model=UploadResponse, responses={400: {"model": Error}, 413: {"model": Error}})
+async def upload_archive(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    entity_id: Optional[str] = Query(None),
+    api_key: str = Depends(verify_api_key)
+):
+    logger.info("Uploading archive")
+    
+    forwarded = await route_session(request, entity_id)
+    if forwarded is not None:
+        return forwarded
+    
+    session_id = entity_id or new_session_id()
+    session_dir = os.path.join(EXECUTION_DIR, session_id)
+    try:
+        paths = await receive_archive(session_id, request.stream())
+        
+        uploaded_files = []
+        for path in paths:
+            file_path = os.path.join(session_dir, path)
+            file_info = get_file_info(file_path)
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            uploaded_files.append(FileObject(
+                name=path,
+                id=str(uuid.uuid4()),
+                session_id=session_id,
+                size=file_info.get("size"),
+                lastModified=file_info.get("lastModified"),
+                etag=file_info.get("etag"),
+                metadata={
+                    "content-type": content_type,
+                    "original-filename": path
+                },
+                contentType=content_type
+            ))
+            if COLUMNAR_CACHE and session_data.is_convertible(file_path):
+                background_tasks.add_task(build_columnar_cache, file_path)
+        
+        logger.info(f"Successfully extracted {len(uploaded_files)} files from archive")
+        return UploadResponse(
+            message="Archive extracted successfully",
+            session_id=session_id,
+            files=uploaded_files
+        )
+    except archives.ArchiveLimitError as e:
+        logger.warning(f"Archive upload rejected: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except archives.ArchiveFormatError as e:
+        logger.warning(f"Archive upload rejected: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during archive upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/archive/{session_id}", responses={400: {"model": Error}, 404: {"model": Error}})
+async def download_archive(
+    session_id: str,
+    request: Request,
+    format: str = Query("zip", description="Archive format: zip, tar, tar.gz or tar.zst"),
+    files: Optional[List[str]] = Query(None, description="Files to include (default: all)"),
+    api_key: str = Depends(verify_api_key)
+):
+    logger.info(f"Downloading {format} archive of session: {session_id}")
+    
+    forwarded = await route_session(request, session_id)
+    if forwarded is not None:
+        return forwarded
+    
+    try:
+        if not tiers.exists(session_id):
+            raise HTTPException(status_code=404, detail="Session not found")
+        if format not in archives.ARCHIVE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported archive format: {format}")
+        
+        entries = session_archive_entries(session_id)
+        if files:
+            by_name = {entry.name: entry for entry in entries}
+            missing = [name for name in files if name not in by_name]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"File not found: {', '.join(missing)}")
+            entries = [by_name[name] for name in dict.fromkeys(files)]
+        
+        tiers.touch(session_id)
+        return StreamingResponse(
+            archives.iter_archive(entries, format),
+            media_type=archives.ARCHIVE_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{session_id}.{format}"'}
+        )
+    except archives.ArchiveFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating archive: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @app.get("/files/{session_id}", response_model=List[FileObject])
 async def get_files(
     session_id: str,
+    request: Request,
     detail: str = Query("simple"),
     api_key: str = Depends(verify_api_key)
 ):
     logger.info(f"Getting files for session: {session_id}")
     
+    forwarded = await route_session(request, session_id)
+    if forwarded is not None:
+        return forwarded
+    
     try:
         session_dir = os.path.join(EXECUTION_DIR, session_id)
         
-        if not os.path.exists(session_dir):
+        if tiers.is_cold(session_id):
+            # Listed from the cold manifest without rehydrating the session
+            cold_files = {entry["name"]: entry for entry in tiers.list_cold_files(session_id)}
+            names = list(cold_files)
+        elif os.path.exists(session_dir):
+            cold_files = {}
+            names = [file for file in os.listdir(session_dir) if os.path.isfile(os.path.join(session_dir, file))]
+        else:
             raise HTTPException(status_code=404, detail="Session not found")
         
         files = []
-        for file in os.listdir(session_dir):
+        for file in names:
             file_path = os.path.join(session_dir, file)
-            if os.path.isfile(file_path):
-                file_obj = FileObject(
-                    name=file,
-                    id=str(uuid.uuid4()),
-                    session_id=session_id
-                )
-                
-                if detail == "full":
-                    file_info = get_file_info(file_path)
-                    file_obj.content = None  # We don't include content for security
-                    file_obj.size = file_info.get("size")
-                    file_obj.lastModified = file_info.get("lastModified")
-                    file_obj.etag = file_info.get("etag")
-                    file_obj.metadata = {
-                        "content-type": "application/octet-stream",
-                        "original-filename": file
-                    }
-                    file_obj.contentType = "application/octet-stream"
-                
-                files.append(file_obj)
+            file_obj = FileObject(
+                name=file,
+                id=str(uuid.uuid4()),
+                session_id=session_id
+            )
+            
+            if detail == "full":
+                file_info = cold_file_info(cold_files[file]) if file in cold_files else get_file_info(file_path)
+                file_obj.content = None  # We don't include content for security
+                file_obj.size = file_info.get("size")
+                file_obj.lastModified = file_info.get("lastModified")
+                file_obj.etag = file_info.get("etag")
+                file_obj.metadata = {
+                    "content-type": "application/octet-stream",
+                    "original-filename": file
+                }
+                file_obj.contentType = "application/octet-stream"
+            
+            files.append(file_obj)
         
         logger.info(f"Found {len(files)} files for session: {session_id}")
         return files
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting files: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -376,21 +1131,29 @@ async def get_files(
 async def delete_file(
     session_id: str,
     file_id: str,
+    request: Request,
     api_key: str = Depends(verify_api_key)
 ):
     logger.info(f"Deleting file: {file_id} from session: {session_id}")
     
+    forwarded = await route_session(request, session_id)
+    if forwarded is not None:
+        return forwarded
+    
     try:
         # In a real implementation, we would map file_id to actual filename
         # For this example, we'll assume file_id is the filename
         file_path = os.path.join(EXECUTION_DIR, session_id, file_id)
-        
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        os.remove(file_path)
+        async with session_in_use(session_id):
+            if not os.path.exists(file_path):
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            os.remove(file_path)
+            session_data.remove_cache(file_path)
         logger.info(f"Successfully deleted file: {file_id}")
         return {"message": "File deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -399,28 +1162,171 @@ async def delete_file(
 async def download_file(
     session_id: str,
     file_id: str,
+    request: Request,
     api_key: str = Depends(verify_api_key)
 ):
     logger.info(f"Downloading file: {file_id} from session: {session_id}")
     
+    forwarded = await route_session(request, session_id)
+    if forwarded is not None:
+        return forwarded
+    
     try:
         # In a real implementation, we would map file_id to actual filename
         # For this example, we'll assume file_id is the filename
         file_path = os.path.join(EXECUTION_DIR, session_id, file_id)
         
+        if tiers.is_cold(session_id):
+            # Stream just this file out of the archive instead of rehydrating.
+            # The blob is opened up front, so a rehydration that deletes the
+            # archive while the response streams does not cut it short.
+            opened = await asyncio.to_thread(tiers.open_cold_file, session_id, file_id)
+            if opened is not None:
+                entry, blob = opened
+                return StreamingResponse(
+                    tiering.iter_blob(blob),
+                    media_type=mimetypes.guess_type(file_id)[0] or "application/octet-stream",
+                    headers={"Content-Length": str(entry["size"])}
+                )
+        
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found")
         
+        tiers.touch(session_id)
         return FileResponse(file_path)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/aggregate", response_model=AggregateResponse, responses={400: {"model": Error}, 404: {"model": Error}})
+async def aggregate(body: AggregateRequest, request: Request, api_key: str = Depends(verify_api_key)):
+    model = body.semanticModel.get("semanticModel", body.semanticModel)
+    logger.info(f"Aggregating {body.file} in session {body.session_id} with model {model.get('name')}")
+    
+    forwarded = await route_session(request, body.session_id)
+    if forwarded is not None:
+        return forwarded
+    
+    try:
+        file_path = session_file_path(body.session_id, body.file)
+        async with session_in_use(body.session_id):
+            if not os.path.isfile(file_path):
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            def run_aggregation():
+                table = load_table(file_path, columns=required_columns(model, body.filters))
+                return evaluate_model(
+                    table,
+                    model,
+                    dimensions=body.dimensions,
+                    measures=body.measures,
+                    filters=body.filters,
+                    order_by=body.order_by,
+                    limit=body.limit
+                )
+            
+            # Parsing, columnar conversion and evaluation can take seconds on large files
+            columns, rows = await asyncio.to_thread(run_aggregation)
+        
+        logger.info(f"Aggregation produced {len(rows)} rows")
+        return AggregateResponse(
+            session_id=body.session_id,
+            model=model.get("name"),
+            columns=columns,
+            rows=rows,
+            row_count=len(rows)
+        )
+    except HTTPException:
+        raise
+    except (SemanticModelError, KeyError) as e:
+        logger.warning(f"Invalid aggregation request: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid semantic model: {e}")
+    except Exception as e:
+        logger.error(f"Error during aggregation: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/workspaces")
+async def get_workspaces(api_key: str = Depends(verify_api_key)):
+    return workspaces.stats()
+
+@app.post("/environments", response_model=EnvironmentResponse, responses={400: {"model": Error}})
+async def build_environment(body: EnvironmentRequest, api_key: str = Depends(verify_api_key)):
+    logger.info(f"Preparing {body.lang} environment: {body.dependencies}")
+
+    try:
+        layer = await asyncio.to_thread(dependency_layers.acquire, body.lang, body.dependencies)
+        dependency_layers.release(layer)
+        metadata = next((m for m in dependency_layers.environments() if m["key"] == layer.key), {})
+        return EnvironmentResponse(
+            key=layer.key,
+            lang=body.lang,
+            dependencies=dependency_envs.normalize(body.lang, body.dependencies),
+            build_seconds=metadata.get("build_seconds"),
+            size=metadata.get("size")
+        )
+    except dependency_envs.DependencyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error preparing environment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/environments")
+async def get_environments(api_key: str = Depends(verify_api_key)):
+    return dependency_layers.stats()
+
+@app.get("/cluster")
+async def get_cluster(api_key: str = Depends(verify_api_key)):
+    if not cluster.enabled:
+        return {"enabled": False}
+    return {"enabled": True, **cluster.status()}
+
+@app.post("/cluster/sessions/{session_id}", include_in_schema=False)
+async def receive_session(session_id: str, request: Request, api_key: str = Depends(verify_api_key)):
+    """Accept a session handed off by another replica."""
+    logger.info(f"Receiving session handoff: {session_id}")
+    
+    try:
+        if os.path.basename(session_id) != session_id or session_id in (".", ".."):
+            raise HTTPException(status_code=400, detail="Invalid session_id")
+        # Keep files this node wrote after the session moved here
+        paths = await receive_archive(session_id, request.stream(), keep_newer=True)
+        return {"message": "Session received", "session_id": session_id, "files": len(paths)}
+    except (archives.ArchiveFormatError, archives.ArchiveLimitError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error receiving session {session_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.delete("/cluster/sessions/{session_id}", include_in_schema=False)
+async def release_session(session_id: str, api_key: str = Depends(verify_api_key)):
+    """Drop a session after its new owner pulled it."""
+    logger.info(f"Releasing session: {session_id}")
+    if os.path.basename(session_id) != session_id or session_id in (".", ".."):
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+    if not await asyncio.to_thread(tiers.remove_if_unused, session_id, tiers.last_access(session_id)):
+        # Kept for now; the rebalance on this node's next heartbeat hands it over
+        raise HTTPException(status_code=409, detail="Session is in use")
+    return {"message": "Session released", "session_id": session_id}
+
 @app.get("/health")
 async def health_check():
     logger.info("Health check requested")
+    if cluster.leaving:
+        # Peers and load balancers stop routing here while sessions drain
+        return JSONResponse(status_code=503, content={"status": "draining", "timestamp": datetime.now().isoformat()})
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    report = toolchains.report()
+    if cluster.leaving:
+        report["ready"] = False
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -431,5 +1337,5 @@ async def global_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
-    logger.info("Starting Code Interpreter Service on port 8700")
-    uvicorn.run(app, host="0.0.0.0", port=8700)
\ No newline at end of file
+    logger.info(f"Starting Code Interpreter Service on port {PORT}")
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""Profiling support for ``/exec`` runs.
+
+Python code runs under ``runtime/sampling_profiler.py``; C, C++ and Go
+binaries run under ``perf record`` when perf is usable in the container.
+Both produce collapsed stacks (``frame;frame;frame count``), from which this
+module renders an SVG flame graph and a top-N hotspot summary.
+"""
+
+import collections
+import html
+import os
+import shutil
+import subprocess
+import zlib
+from functools import lru_cache
+from typing import Dict, List
+
+PYTHON_LANGUAGES = ("py",)
+PERF_LANGUAGES = ("c", "cpp", "go")
+
+COLLAPSED_NAME = "profile.collapsed"
+FLAMEGRAPH_NAME = "flamegraph.svg"
+PERF_DATA_NAME = ".perf.data"
+
+FLAME_WIDTH = 1200
+FRAME_HEIGHT = 16
+FONT_SIZE = 12
+MIN_FRAME_WIDTH = 0.5
+
+
+@lru_cache(maxsize=1)
+def perf_available() -> bool:
+    """Whether ``perf record`` works here (it is often blocked in containers)."""
+    if not shutil.which("perf"):
+        return False
+    try:
+        result = subprocess.run(
+            ["perf", "record", "-q", "-o", "/dev/null", "--", "true"],
+            capture_output=True,
+            timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+def supported(lang: str) -> bool:
+    return lang in PYTHON_LANGUAGES or (lang in PERF_LANGUAGES and perf_available())
+
+
+def perf_prefix(frequency: int) -> str:
+    return f"perf record -q -F {frequency} -g -o {PERF_DATA_NAME} -- "
+
+
+def collapse_perf(session_dir: str) -> Dict[str, int]:
+    """Fold ``perf script`` output for the session's perf data into collapsed stacks."""
+    result = subprocess.run(
+        ["perf", "script", "-i", PERF_DATA_NAME],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        cwd=session_dir
+    )
+    counts = collections.Counter()
+    stack: List[str] = []
+    for line in result.stdout.splitlines() + [""]:
+        if not line.strip():
+            if stack:
+                counts[";".join(reversed(stack))] += 1
+            stack = []
+        elif line[0] in " \t":
+            # Frame line: "<address> <symbol>+<offset> (<dso>)"
+            parts = line.strip().split(" ", 1)
+            symbol = parts[1].rsplit(" (", 1)[0] if len(parts) > 1 else ""
+            stack.append(symbol.split("+0x")[0] or "[unknown]")
+        else:
+            # Sample header: "<comm> <pid> <time>: <period> <event>:"
+            stack = []
+    return dict(counts)
+
+
+def read_collapsed(path: str) -> Dict[str, int]:
+    counts = collections.Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                counts[stack] += int(count)
+    return dict(counts)
+
+
+def write_collapsed(path: str, counts: Dict[str, int]):
+    with open(path, "w") as f:
+        for stack, count in sorted(counts.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def hotspots(counts: Dict[str, int], top_n: int) -> List[dict]:
+    """Functions ranked by self samples, with inclusive ("total") samples."""
+    total_samples = sum(counts.values())
+    self_counts = collections.Counter()
+    total_counts = collections.Counter()
+    for stack, count in counts.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        {
+            "function": frame,
+            "self_samples": count,
+            "self_percent": round(100.0 * count / total_samples, 2),
+            "total_percent": round(100.0 * total_counts[frame] / total_samples, 2),
+        }
+        for frame, count in self_counts.most_common(top_n)
+    ]
+
+
+def _color(name: str) -> str:
+    # Stable warm palette, as in classic CPU flame graphs
+    h = zlib.crc32(name.encode())
+    return f"rgb({205 + h % 50},{(h >> 8) % 180},{(h >> 16) % 55})"
+
+
+def render_flamegraph(counts: Dict[str, int], title: str = "Flame Graph") -> str:
+    """Render collapsed stacks as a self-contained SVG flame graph."""
+    root = {"children": {}, "value": 0}
+    for stack, count in sorted(counts.items()):
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"children": {}, "value": 0})
+            node["value"] += count
+
+    total = root["value"] or 1
+    scale = (FLAME_WIDTH - 20) / total
+    rects = []
+    max_depth = 0
+
+    def layout(node, x, depth):
+        nonlocal max_depth
+        for name, child in node["children"].items():
+            width = child["value"] * scale
+            if width >= MIN_FRAME_WIDTH:
+                max_depth = max(max_depth, depth)
+                rects.append((name, x, depth, width, child["value"]))
+                layout(child, x, depth + 1)
+            x += width
+
+    layout(root, 10.0, 0)
+    height = (max_depth + 1) * FRAME_HEIGHT + 60
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAME_WIDTH}" height="{height}" '
+        f'font-family="Verdana" font-size="{FONT_SIZE}">',
+        f'<rect width="100%" height="100%" fill="#f8f8f8"/>',
+        f'<text x="{FLAME_WIDTH // 2}" y="24" text-anchor="middle" font-size="16">{html.escape(title)}</text>',
+    ]
+    for name, x, depth, width, value in rects:
+        y = height - 20 - (depth + 1) * FRAME_HEIGHT
+        label = html.escape(name)
+        percent = 100.0 * value / total
+        parts.append(
+            f'<g><title>{label} ({value} samples, {percent:.2f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{_color(name)}" rx="2"/>'
+        )
+        chars = int(width / (FONT_SIZE * 0.6))
+        if chars >= 3:
+            text = name if len(name) <= chars else name[:chars - 2] + ".."
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + FRAME_HEIGHT - 4}">{html.escape(text)}</text>')
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def finalize(session_dir: str, lang: str, top_n: int) -> dict:
+    """Turn the raw profile of a finished run into artifacts and a summary.
+
+    Writes ``profile.collapsed`` and ``flamegraph.svg`` into the session and
+    returns the summary placed in ``ExecuteResponse.run["profile"]``.
+    """
+    collapsed_path = os.path.join(session_dir, COLLAPSED_NAME)
+    perf_data = os.path.join(session_dir, PERF_DATA_NAME)
+    try:
+        if lang in PERF_LANGUAGES:
+            if not os.path.exists(perf_data):
+                return {"status": "failed", "message": "No perf data was recorded"}
+            counts = collapse_perf(session_dir)
+            write_collapsed(collapsed_path, counts)
+        elif os.path.exists(collapsed_path):
+            counts = read_collapsed(collapsed_path)
+        else:
+            return {"status": "failed", "message": "No profile was recorded"}
+    finally:
+        if os.path.exists(perf_data):
+            os.remove(perf_data)
+
+    with open(os.path.join(session_dir, FLAMEGRAPH_NAME), "w") as f:
+        f.write(render_flamegraph(counts, title=f"Profile of code.{lang}"))
+    return {
+        "status": "ok",
+        "profiler": "perf" if lang in PERF_LANGUAGES else "sampling",
+        "samples": sum(counts.values()),
+        "hotspots": hotspots(counts, top_n),
+        "files": [COLLAPSED_NAME, FLAMEGRAPH_NAME],
+    }
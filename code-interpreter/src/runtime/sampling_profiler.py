@@ -0,0 +1,105 @@
+"""Wall-clock sampling profiler for user scripts run through ``/exec``.
+
+Usage::
+
+    python3 -m sampling_profiler --output profile.collapsed [--interval 0.005]
+        [--deadline 28] -- script.py [args...]
+
+Every ``interval`` seconds of wall time a ``SIGALRM`` handler records the
+current Python stack, so overhead is bounded by the sampling rate rather than
+by how many calls the script makes, and time spent sleeping or blocked on I/O
+is visible too.  Stacks are written in the collapsed format used by flame
+graph tools (``frame;frame;frame count``).
+
+If the script is still running after ``deadline`` seconds the profile is
+written anyway and the process exits, so runs that would hit the service
+timeout still report where their time went.
+"""
+
+import argparse
+import collections
+import os
+import runpy
+import signal
+import sys
+import threading
+
+_SKIP_FILES = (os.path.abspath(__file__), runpy.__file__)
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            if frame.f_code.co_filename not in _SKIP_FILES:
+                stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            with self._lock:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        signal.signal(signal.SIGALRM, self._sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def write(self, path: str):
+        with self._lock:
+            counts = dict(self.counts)
+        with open(path, "w") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sampling_profiler")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--deadline", type=float, default=None)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+
+    sampler = Sampler(options.interval)
+    written = threading.Event()
+
+    def finish():
+        if not written.is_set():
+            written.set()
+            sampler.stop()
+            sampler.write(options.output)
+
+    def on_deadline():
+        finish()
+        sys.stdout.flush()
+        sys.stderr.write(f"\nProfiling stopped after {options.deadline:g}s deadline\n")
+        sys.stderr.flush()
+        os._exit(124)
+
+    if options.deadline:
+        timer = threading.Timer(options.deadline, on_deadline)
+        timer.daemon = True
+        timer.start()
+
+    sys.argv = [options.script] + options.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+    sampler.start()
+    try:
+        runpy.run_path(options.script, run_name="__main__")
+    finally:
+        finish()
+
+
+if __name__ == "__main__":
+    main()
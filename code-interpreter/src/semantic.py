@@ -0,0 +1,819 @@
+"""Native evaluation of chart_schema-style semantic models.
+
+A semantic model (see ``test_case/chart_schema.json``) describes dimensions,
+measures and filters over a tabular source.  Instead of asking the LLM to
+write pandas code and spawning an interpreter through ``/exec``, the model is
+evaluated here directly on an Arrow table:
+
+* filters on dimensions/columns are applied before aggregation (``WHERE``);
+  range filters on the ``timeDimension`` are applied after window functions
+  so that e.g. ``lag()`` sees the day before the range,
+* ``sum``/``count``/``avg``/``min``/``max``/``count_distinct`` measures are
+  computed with a single Arrow ``group_by``,
+* calculated measures are parsed once and evaluated as NumPy vector
+  expressions over the aggregated rows, including window functions such as
+  ``lag(x) over (order by date)``,
+* filters on measures are applied after aggregation (``HAVING``).
+"""
+
+import datetime
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from runtime import session_data
+
+
+class SemanticModelError(ValueError):
+    """Raised when a semantic model or query cannot be evaluated."""
+
+
+AGGREGATIONS = {
+    "sum": "sum",
+    "count": "count",
+    "count_distinct": "count_distinct",
+    "avg": "mean",
+    "mean": "mean",
+    "min": "min",
+    "max": "max",
+}
+
+SUPPORTED_EXTENSIONS = session_data.CONVERTIBLE_EXTENSIONS + (".parquet", ".pq", ".arrow", ".feather")
+
+GRANULARITIES = ("day", "week", "month", "quarter", "year")
+
+WINDOW_FUNCTIONS = ("lag", "lead", "sum", "avg", "min", "max", "count", "row_number")
+
+SCALAR_FUNCTIONS = ("abs", "round", "coalesce", "nullif")
+
+
+# Loading
+
+def load_table(file_path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """Read a tabular file into an Arrow table, projecting ``columns``.
+
+    CSV, JSON and Excel sources go through the session's columnar cache, so
+    only the first aggregation over a file pays for parsing it.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise SemanticModelError(f"Unsupported file type for aggregation: {ext or file_path}")
+    try:
+        return session_data.read_table(file_path, columns=columns)
+    except (KeyError, pa.ArrowInvalid) as e:
+        raise SemanticModelError(f"Column not found in source: {e}")
+
+
+# Expression parsing
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+\.\d*|\.\d+|\d+)"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r"|(?P<ident>[A-Za-z_][A-Za-z0-9_]*|\"[^\"]+\")"
+    r"|(?P<op><=|>=|<>|!=|[-+*/(),<>=%])"
+    r")"
+)
+
+_KEYWORDS = {
+    "and", "or", "not", "case", "when", "then", "else", "end", "over",
+    "partition", "order", "by", "asc", "desc", "is", "null", "in", "between",
+}
+
+
+def _tokenize(expression: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise SemanticModelError(f"Unexpected character at {pos} in expression: {expression!r}")
+        pos = match.end()
+        if match.group("number") is not None:
+            text = match.group("number")
+            tokens.append(("num", float(text) if "." in text else int(text)))
+        elif match.group("string") is not None:
+            tokens.append(("str", match.group("string")[1:-1].replace("''", "'")))
+        elif match.group("ident") is not None:
+            text = match.group("ident")
+            if text.startswith('"'):
+                tokens.append(("ident", text[1:-1]))
+            elif text.lower() in _KEYWORDS:
+                tokens.append(("kw", text.lower()))
+            else:
+                tokens.append(("ident", text))
+        else:
+            tokens.append(("op", match.group("op")))
+    tokens.append(("eof", None))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for the SQL subset used by calculated measures.
+
+    Nodes are tuples whose first item is the node kind, e.g.
+    ``("bin", "/", left, right)`` or ``("window", "lag", args, partition, order)``.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def parse(self):
+        node = self._or()
+        if self._peek()[0] != "eof":
+            self._error(f"unexpected token {self._peek()[1]!r}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos]
+
+    def _next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _accept(self, kind, value=None):
+        token = self._peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, kind, value=None):
+        if not self._accept(kind, value):
+            self._error(f"expected {value or kind}, got {self._peek()[1]!r}")
+
+    def _error(self, message):
+        raise SemanticModelError(f"Invalid expression {self.expression!r}: {message}")
+
+    def _or(self):
+        node = self._and()
+        while self._accept("kw", "or"):
+            node = ("or", node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self._accept("kw", "and"):
+            node = ("and", node, self._not())
+        return node
+
+    def _not(self):
+        if self._accept("kw", "not"):
+            return ("not", self._not())
+        return self._comparison()
+
+    def _comparison(self):
+        node = self._additive()
+        token = self._peek()
+        if token[0] == "op" and token[1] in ("=", "!=", "<>", "<", "<=", ">", ">="):
+            self._next()
+            op = "!=" if token[1] == "<>" else token[1]
+            return ("cmp", op, node, self._additive())
+        if self._accept("kw", "is"):
+            negate = self._accept("kw", "not")
+            self._expect("kw", "null")
+            return ("isnull", node, negate)
+        negate = self._accept("kw", "not")
+        if self._accept("kw", "between"):
+            low = self._additive()
+            self._expect("kw", "and")
+            high = self._additive()
+            node = ("and", ("cmp", ">=", node, low), ("cmp", "<=", node, high))
+            return ("not", node) if negate else node
+        if self._accept("kw", "in"):
+            self._expect("op", "(")
+            values = [self._additive()]
+            while self._accept("op", ","):
+                values.append(self._additive())
+            self._expect("op", ")")
+            return ("in", node, values, negate)
+        if negate:
+            self._error("expected BETWEEN or IN after NOT")
+        return node
+
+    def _additive(self):
+        node = self._multiplicative()
+        while self._peek() in (("op", "+"), ("op", "-")):
+            node = ("bin", self._next()[1], node, self._multiplicative())
+        return node
+
+    def _multiplicative(self):
+        node = self._unary()
+        while self._peek() in (("op", "*"), ("op", "/"), ("op", "%")):
+            node = ("bin", self._next()[1], node, self._unary())
+        return node
+
+    def _unary(self):
+        if self._accept("op", "-"):
+            return ("neg", self._unary())
+        if self._accept("op", "+"):
+            return self._unary()
+        return self._primary()
+
+    def _primary(self):
+        kind, value = self._next()
+        if kind == "num":
+            return ("lit", value)
+        if kind == "str":
+            return ("lit", value)
+        if kind == "kw" and value == "null":
+            return ("lit", None)
+        if kind == "kw" and value == "case":
+            return self._case()
+        if kind == "op" and value == "(":
+            node = self._or()
+            self._expect("op", ")")
+            return node
+        if kind == "ident":
+            if self._accept("op", "("):
+                return self._call(value.lower())
+            return ("ref", value)
+        self._error(f"unexpected token {value!r}")
+
+    def _case(self):
+        branches = []
+        while self._accept("kw", "when"):
+            condition = self._or()
+            self._expect("kw", "then")
+            branches.append((condition, self._or()))
+        if not branches:
+            self._error("CASE requires at least one WHEN branch")
+        default = ("lit", None)
+        if self._accept("kw", "else"):
+            default = self._or()
+        self._expect("kw", "end")
+        return ("case", branches, default)
+
+    def _call(self, name):
+        args = []
+        if not self._accept("op", ")"):
+            args.append(self._or())
+            while self._accept("op", ","):
+                args.append(self._or())
+            self._expect("op", ")")
+        if self._accept("kw", "over"):
+            if name not in WINDOW_FUNCTIONS:
+                self._error(f"{name}() is not a supported window function")
+            return ("window", name, args) + self._window_spec()
+        if name not in SCALAR_FUNCTIONS:
+            self._error(f"unsupported function {name}()")
+        return ("call", name, args)
+
+    def _window_spec(self):
+        self._expect("op", "(")
+        partition, order = [], []
+        if self._accept("kw", "partition"):
+            self._expect("kw", "by")
+            partition.append(self._additive())
+            while self._accept("op", ","):
+                partition.append(self._additive())
+        if self._accept("kw", "order"):
+            self._expect("kw", "by")
+            while True:
+                key = self._additive()
+                descending = self._accept("kw", "desc")
+                if not descending:
+                    self._accept("kw", "asc")
+                order.append((key, descending))
+                if not self._accept("op", ","):
+                    break
+        self._expect("op", ")")
+        return partition, order
+
+
+def parse_expression(expression: str):
+    """Parse a calculated-measure expression into an AST."""
+    return _Parser(expression).parse()
+
+
+# Vectorized evaluation
+
+def _has_window(node) -> bool:
+    if isinstance(node, tuple) and node and node[0] == "window":
+        return True
+    if isinstance(node, (tuple, list)):
+        return any(_has_window(item) for item in node)
+    return False
+
+
+def _dense_rank(values: np.ndarray) -> np.ndarray:
+    """Rank ``values`` densely (ties share a rank, nulls sort last)."""
+    ranks = pc.rank(pa.array(values, from_pandas=True), sort_keys="ascending", tiebreaker="dense")
+    return ranks.to_numpy().astype(np.int64)
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    try:
+        if values.dtype == object:
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return values.astype(np.float64, copy=False)
+    except (TypeError, ValueError) as e:
+        raise SemanticModelError(f"Expected numeric values: {e}")
+
+
+def _is_null(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    if values.dtype.kind == "M":
+        return np.isnat(values)
+    if values.dtype == object:
+        return np.array([v is None or (isinstance(v, float) and math.isnan(v)) for v in values], dtype=bool)
+    return np.zeros(len(values), dtype=bool)
+
+
+class _Evaluator:
+    """Evaluate parsed expressions against a dict of equally sized NumPy columns."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], calculated: Dict[str, Any], length: int):
+        self.columns = columns
+        self.calculated = calculated
+        self.length = length
+        self._resolving = set()
+
+    def resolve(self, name: str) -> np.ndarray:
+        if name in self.columns:
+            return self.columns[name]
+        if name in self.calculated:
+            if name in self._resolving:
+                raise SemanticModelError(f"Circular reference in calculated measure: {name}")
+            self._resolving.add(name)
+            try:
+                self.columns[name] = self._broadcast(self.eval(self.calculated[name]))
+            finally:
+                self._resolving.discard(name)
+            return self.columns[name]
+        raise SemanticModelError(f"Unknown field in expression: {name}")
+
+    def _broadcast(self, value) -> np.ndarray:
+        if isinstance(value, np.ndarray):
+            return value
+        if value is None:
+            return np.full(self.length, np.nan)
+        return np.full(self.length, value, dtype=object if isinstance(value, str) else None)
+
+    def eval(self, node):
+        kind = node[0]
+        if kind == "lit":
+            return node[1]
+        if kind == "ref":
+            return self.resolve(node[1])
+        if kind == "neg":
+            return -_as_float(self._broadcast(self.eval(node[1])))
+        if kind == "bin":
+            return self._binary(node[1], self.eval(node[2]), self.eval(node[3]))
+        if kind == "cmp":
+            return self._compare(node[1], self.eval(node[2]), self.eval(node[3]))
+        if kind == "and":
+            return np.logical_and(self._truth(node[1]), self._truth(node[2]))
+        if kind == "or":
+            return np.logical_or(self._truth(node[1]), self._truth(node[2]))
+        if kind == "not":
+            return np.logical_not(self._truth(node[1]))
+        if kind == "isnull":
+            nulls = _is_null(self._broadcast(self.eval(node[1])))
+            return ~nulls if node[2] else nulls
+        if kind == "in":
+            values = self._broadcast(self.eval(node[1]))
+            options = [self.eval(option) for option in node[2]]
+            result = np.isin(values, options)
+            return ~result if node[3] else result
+        if kind == "case":
+            return self._case(node[1], node[2])
+        if kind == "call":
+            return self._call(node[1], node[2])
+        if kind == "window":
+            return self._window(*node[1:])
+        raise SemanticModelError(f"Unsupported expression node: {kind}")
+
+    def _truth(self, node) -> np.ndarray:
+        value = self._broadcast(self.eval(node))
+        if value.dtype == bool:
+            return value
+        return np.nan_to_num(_as_float(value), nan=0.0) != 0
+
+    def _binary(self, op, left, right):
+        left = _as_float(self._broadcast(left))
+        right = _as_float(self._broadcast(right))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if op == "+":
+                result = left + right
+            elif op == "-":
+                result = left - right
+            elif op == "*":
+                result = left * right
+            elif op == "/":
+                result = left / right
+            else:
+                result = np.fmod(left, right)
+        # SQL yields NULL rather than infinity on division by zero
+        result[np.isinf(result)] = np.nan
+        return result
+
+    def _compare(self, op, left, right):
+        left = self._broadcast(left)
+        right = self._broadcast(right)
+        if left.dtype.kind in "iufb" or right.dtype.kind in "iufb":
+            left, right = _as_float(left), _as_float(right)
+        elif left.dtype.kind == "M" or right.dtype.kind == "M":
+            left = left.astype("datetime64[D]") if left.dtype.kind != "M" else left
+            right = right.astype("datetime64[D]") if right.dtype.kind != "M" else right
+        nulls = _is_null(left) | _is_null(right)
+        with np.errstate(invalid="ignore"):
+            if op == "=":
+                result = left == right
+            elif op == "!=":
+                result = left != right
+            elif op == "<":
+                result = left < right
+            elif op == "<=":
+                result = left <= right
+            elif op == ">":
+                result = left > right
+            else:
+                result = left >= right
+        return np.asarray(result, dtype=bool) & ~nulls
+
+    def _case(self, branches, default):
+        result = self._broadcast(self.eval(default))
+        for condition, value in reversed(branches):
+            value = self._broadcast(self.eval(value))
+            if result.dtype.kind in "iu" and value.dtype.kind == "f":
+                result = result.astype(np.float64)
+            elif result.dtype.kind == "f" and value.dtype.kind in "iu" and np.isnan(result).any():
+                value = value.astype(np.float64)
+            result = np.where(self._truth(condition), value, result)
+        return result
+
+    def _call(self, name, args):
+        values = [self.eval(arg) for arg in args]
+        if name == "abs":
+            return np.abs(_as_float(self._broadcast(values[0])))
+        if name == "round":
+            digits = int(values[1]) if len(values) > 1 else 0
+            return np.round(_as_float(self._broadcast(values[0])), digits)
+        if name == "coalesce":
+            result = self._broadcast(values[-1])
+            for value in reversed(values[:-1]):
+                value = self._broadcast(value)
+                result = np.where(_is_null(value), result, value)
+            return result
+        if name == "nullif":
+            value = _as_float(self._broadcast(values[0]))
+            return np.where(self._compare("=", value, values[1]), np.nan, value)
+        raise SemanticModelError(f"Unsupported function {name}()")
+
+    def _window(self, name, args, partition, order):
+        """Evaluate a window function over the whole (aggregated) frame.
+
+        Rows are sorted once by (partition keys, order keys) with ``lexsort``;
+        the function is applied on the sorted vector and scattered back.
+        """
+        if not self.length:
+            return np.empty(0)
+        keys = [_dense_rank(self._broadcast(self.eval(key))) for key in partition]
+        order_keys = []
+        for key, descending in order:
+            rank = _dense_rank(self._broadcast(self.eval(key)))
+            order_keys.append(-rank if descending else rank)
+        sort_keys = keys + order_keys
+        if sort_keys:
+            # lexsort uses the last key as primary, so reverse the SQL order
+            index = np.lexsort(tuple(reversed(sort_keys)))
+        else:
+            index = np.arange(self.length)
+
+        group = np.zeros(self.length, dtype=np.int64)
+        if keys:
+            sorted_keys = np.stack([k[index] for k in keys])
+            boundary = np.any(sorted_keys[:, 1:] != sorted_keys[:, :-1], axis=0)
+            group[1:] = np.cumsum(boundary)
+        starts = np.r_[0, np.flatnonzero(np.diff(group)) + 1]
+        position = np.arange(self.length) - starts[group]
+
+        if name in ("lag", "lead"):
+            values = _as_float(self._broadcast(self.eval(args[0])))[index]
+            offset = int(self.eval(args[1])) if len(args) > 1 else 1
+            default = self.eval(args[2]) if len(args) > 2 else None
+            shift = offset if name == "lag" else -offset
+            source = np.arange(self.length) - shift
+            valid = (source >= 0) & (source < self.length)
+            valid[valid] &= group[source[valid]] == group[valid]
+            shifted = np.full(self.length, np.nan if default is None else float(default))
+            shifted[valid] = values[source[valid]]
+            sorted_result = shifted
+        elif name == "row_number":
+            sorted_result = position + 1
+        else:
+            values = _as_float(self._broadcast(self.eval(args[0]))) if args else np.ones(self.length)
+            values = values[index]
+            sorted_result = self._frame_aggregate(name, values, group, starts, position, bool(order))
+
+        result = np.empty(self.length, dtype=sorted_result.dtype)
+        result[index] = sorted_result
+        return result
+
+    @staticmethod
+    def _frame_aggregate(name, values, group, starts, position, running):
+        """Aggregate per partition: running totals with ORDER BY, whole partition otherwise."""
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        if name in ("sum", "avg", "count"):
+            totals = np.cumsum(filled)
+            counts = np.cumsum(present)
+            base_totals = np.r_[0.0, totals][starts]
+            base_counts = np.r_[0, counts][starts]
+            if running:
+                part_total = totals - base_totals[group]
+                part_count = counts - base_counts[group]
+            else:
+                ends = np.r_[starts[1:], len(values)] - 1
+                part_total = (totals[ends] - base_totals)[group]
+                part_count = (counts[ends] - base_counts)[group]
+            if name == "count":
+                return part_count.astype(np.int64)
+            if name == "sum":
+                return np.where(part_count > 0, part_total, np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(part_count > 0, part_total / part_count, np.nan)
+
+        ufunc = np.fmin if name == "min" else np.fmax
+        if running:
+            result = np.empty(len(values))
+            for start, end in zip(starts, np.r_[starts[1:], len(values)]):
+                result[start:end] = ufunc.accumulate(values[start:end])
+            return result
+        return ufunc.reduceat(values, starts)[group]
+
+
+# Model evaluation
+
+def _coerce_value(value, data_type: pa.DataType):
+    if pa.types.is_date(data_type) and isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    if pa.types.is_timestamp(data_type) and isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+def _filter_mask(column: pa.ChunkedArray, operator: str, values: List[Any]):
+    try:
+        return _filter_condition(column, operator.lower(), [_coerce_value(value, column.type) for value in values])
+    except SemanticModelError:
+        raise
+    except (pa.ArrowException, ValueError) as e:
+        raise SemanticModelError(f"Cannot compare {column.type} column with {values!r}: {e}")
+
+
+def _filter_condition(column: pa.ChunkedArray, operator: str, values: List[Any]):
+    if operator in ("=", "==", "equals", "eq"):
+        return pc.equal(column, values[0])
+    if operator in ("!=", "<>", "notequals", "ne"):
+        return pc.not_equal(column, values[0])
+    if operator in (">", "gt"):
+        return pc.greater(column, values[0])
+    if operator in (">=", "gte"):
+        return pc.greater_equal(column, values[0])
+    if operator in ("<", "lt"):
+        return pc.less(column, values[0])
+    if operator in ("<=", "lte"):
+        return pc.less_equal(column, values[0])
+    if operator == "between":
+        if len(values) != 2:
+            raise SemanticModelError("between filter requires exactly two values")
+        return pc.and_(pc.greater_equal(column, values[0]), pc.less_equal(column, values[1]))
+    if operator in ("in", "not in", "notin"):
+        mask = pc.is_in(column, value_set=pa.array(values, type=column.type))
+        return pc.invert(mask) if operator != "in" else mask
+    raise SemanticModelError(f"Unsupported filter operator: {operator}")
+
+
+def _normalize_dimension(column: pa.ChunkedArray, dimension: Dict[str, Any]) -> pa.ChunkedArray:
+    """Cast date/time dimensions to temporal types and apply ``granularity``."""
+    dim_type = (dimension.get("type") or "").lower()
+    if dim_type not in ("date", "time", "timestamp", "datetime"):
+        return column
+    granularity = (dimension.get("granularity") or "day").lower()
+    if granularity not in GRANULARITIES:
+        raise SemanticModelError(f"Unsupported granularity: {granularity}")
+    try:
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = pc.cast(column, pa.timestamp("s"))
+        if granularity != "day":
+            column = pc.floor_temporal(column, unit=granularity, week_starts_monday=True)
+        if dim_type == "date" and not pa.types.is_date32(column.type):
+            column = pc.cast(column, pa.date32())
+    except pa.ArrowException as e:
+        raise SemanticModelError(f"Cannot read dimension {dimension['name']} as {dim_type}: {e}")
+    return column
+
+
+def _to_numpy(column: pa.ChunkedArray) -> np.ndarray:
+    if pa.types.is_integer(column.type) and column.null_count:
+        column = pc.cast(column, pa.float64())
+    return column.to_numpy()
+
+
+def _to_json_value(value):
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _parse_order(spec: str) -> Tuple[str, bool]:
+    parts = spec.split()
+    if not parts or len(parts) > 2 or (len(parts) == 2 and parts[1].lower() not in ("asc", "desc")):
+        raise SemanticModelError(f"Invalid order specification: {spec!r}")
+    return parts[0], len(parts) == 2 and parts[1].lower() == "desc"
+
+
+def required_columns(model: Dict[str, Any], filters: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+    """Source columns referenced by the model's dimensions, measures and filters."""
+    columns = []
+    for dimension in model.get("dimensions", []):
+        columns.append(dimension.get("column") or dimension["name"])
+    for measure in model.get("measures", []):
+        if (measure.get("type") or "sum").lower() != "calculated":
+            columns.append(measure.get("column") or measure["name"])
+    measure_names = {m["name"] for m in model.get("measures", [])}
+    dimension_names = {d["name"] for d in model.get("dimensions", [])}
+    for flt in list(model.get("filters", [])) + list(filters or []):
+        name = flt.get("dimension") or flt.get("column")
+        if name and name not in measure_names and name not in dimension_names:
+            columns.append(name)
+    return list(dict.fromkeys(columns))
+
+
+def evaluate_model(
+    table: pa.Table,
+    model: Dict[str, Any],
+    dimensions: Optional[List[str]] = None,
+    measures: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    order_by: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Evaluate ``model`` over ``table`` and return ``(columns, rows)``.
+
+    ``dimensions`` and ``measures`` restrict the output to a subset of the
+    model's fields; ``filters`` are appended to the model's own filters.
+    Rows are ordered by ``order_by`` (``"name"`` or ``"name desc"``), falling
+    back to the model's ``timeDimension`` and then the group-by dimensions.
+    """
+    model_dimensions = {d["name"]: d for d in model.get("dimensions", [])}
+    model_measures = {m["name"]: m for m in model.get("measures", [])}
+    if not model_measures:
+        raise SemanticModelError("Semantic model defines no measures")
+
+    dimension_names = dimensions if dimensions is not None else list(model_dimensions)
+    measure_names = measures if measures is not None else list(model_measures)
+    for name in dimension_names:
+        if name not in model_dimensions:
+            raise SemanticModelError(f"Unknown dimension: {name}")
+    for name in measure_names:
+        if name not in model_measures:
+            raise SemanticModelError(f"Unknown measure: {name}")
+
+    def source_column(dimension):
+        column = dimension.get("column") or dimension["name"]
+        if column not in table.column_names:
+            raise SemanticModelError(f"Column not found in source: {column}")
+        return _normalize_dimension(table.column(column), dimension)
+
+    calculated = {}
+    for name, measure in model_measures.items():
+        if (measure.get("type") or "sum").lower() == "calculated":
+            calculated[name] = parse_expression(measure.get("expression") or "")
+
+    # Filters on the time dimension are applied after window functions, so
+    # that lag() on the first day of a range sees the day before it
+    time_dimension = model.get("timeDimension")
+    defer_time_filters = time_dimension in dimension_names and _has_window(list(calculated.values()))
+
+    # WHERE: filters on dimensions or raw columns, applied before grouping
+    having = []
+    deferred = []
+    mask = None
+    for flt in list(model.get("filters", [])) + list(filters or []):
+        name = flt.get("dimension") or flt.get("column")
+        values = flt.get("values")
+        if values is None:
+            values = [flt.get("value")]
+        if name in model_measures:
+            having.append((name, flt.get("operator", "="), values))
+            continue
+        if defer_time_filters and name == time_dimension:
+            deferred.append((flt.get("operator", "="), values))
+            continue
+        if name in model_dimensions:
+            column = source_column(model_dimensions[name])
+        elif name in table.column_names:
+            column = table.column(name)
+        else:
+            raise SemanticModelError(f"Unknown filter field: {name}")
+        condition = _filter_mask(column, flt.get("operator", "="), values)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        table = table.filter(pc.fill_null(mask, False))
+
+    # GROUP BY: one Arrow hash aggregation for every base measure
+    grouped = pa.table({name: source_column(model_dimensions[name]) for name in dimension_names}) \
+        if dimension_names else pa.table({"__all__": pa.array(np.zeros(table.num_rows, dtype=np.int8))})
+    aggregations = []
+    base_names = []
+    for name, measure in model_measures.items():
+        measure_type = (measure.get("type") or "sum").lower()
+        if measure_type == "calculated":
+            continue
+        if measure_type not in AGGREGATIONS:
+            raise SemanticModelError(f"Unsupported measure type: {measure_type}")
+        column = measure.get("column") or name
+        if column not in table.column_names:
+            raise SemanticModelError(f"Column not found in source: {column}")
+        field = f"__m{len(base_names)}"
+        grouped = grouped.append_column(field, table.column(column))
+        aggregations.append((field, AGGREGATIONS[measure_type]))
+        base_names.append(name)
+    key_names = dimension_names or ["__all__"]
+    try:
+        result = grouped.group_by(key_names, use_threads=False).aggregate(aggregations)
+    except pa.ArrowException as e:
+        raise SemanticModelError(f"Cannot aggregate measures: {e}")
+
+    columns = {}
+    for name in dimension_names:
+        columns[name] = _to_numpy(result.column(name))
+    for (field, function), name in zip(aggregations, base_names):
+        columns[name] = _to_numpy(result.column(f"{field}_{function}"))
+    length = result.num_rows
+
+    keep = np.ones(length, dtype=bool)
+    for operator, values in deferred:
+        keep &= pc.fill_null(_filter_mask(result.column(time_dimension), operator, values), False).to_numpy()
+
+    # Groups are sorted by the time dimension first so that window functions
+    # without an explicit ORDER BY see rows in chronological order
+    natural = [d for d in dimension_names if d == time_dimension] + \
+        [d for d in dimension_names if d != time_dimension]
+    if natural and length:
+        index = np.lexsort(tuple(_dense_rank(columns[name]) for name in reversed(natural)))
+        columns = {name: values[index] for name, values in columns.items()}
+        keep = keep[index]
+    ordering = [_parse_order(spec) for spec in order_by] if order_by else []
+
+    evaluator = _Evaluator(columns, calculated, length)
+    for name in measure_names:
+        evaluator.resolve(name)
+    for name, _, _ in having:
+        evaluator.resolve(name)
+
+    for name, operator, values in having:
+        operator = operator.lower()
+        column = columns[name]
+        if operator == "between":
+            keep &= evaluator._compare(">=", column, values[0]) & evaluator._compare("<=", column, values[1])
+        elif operator in ("in", "not in", "notin"):
+            matched = np.isin(column, values)
+            keep &= matched if operator == "in" else ~matched
+        else:
+            aliases = {"==": "=", "eq": "=", "equals": "=", "<>": "!=", "ne": "!=", "notequals": "!=",
+                       "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+            op = aliases.get(operator, operator)
+            if op not in ("=", "!=", "<", "<=", ">", ">="):
+                raise SemanticModelError(f"Unsupported filter operator: {operator}")
+            keep &= evaluator._compare(op, column, values[0])
+
+    index = np.flatnonzero(keep)
+    if ordering:
+        sort_keys = []
+        for name, descending in ordering:
+            if name not in columns:
+                raise SemanticModelError(f"Unknown order field: {name}")
+            rank = _dense_rank(columns[name][index])
+            sort_keys.append(-rank if descending else rank)
+        index = index[np.lexsort(tuple(reversed(sort_keys)))]
+    if limit is not None:
+        index = index[:limit]
+
+    output = dimension_names + measure_names
+    data = []
+    for name in output:
+        values = columns[name][index]
+        if values.dtype.kind == "M" and np.datetime_data(values.dtype)[0] not in ("D", "s", "ms", "us"):
+            values = values.astype("datetime64[us]")
+        data.append(values.tolist())
+    rows = [
+        {name: _to_json_value(value) for name, value in zip(output, values)}
+        for values in zip(*data)
+    ]
+    return output, rows
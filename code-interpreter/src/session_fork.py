@@ -0,0 +1,132 @@
+"""Copy-on-write forking of session directories.
+
+A fork clones every file of the parent session without copying bytes:
+
+* ``reflink`` uses the ``FICLONE`` ioctl (btrfs, XFS, bcachefs, ...), giving
+  true block-level copy-on-write,
+* ``hardlink`` shares inodes between parent and fork; a shared file is
+  detached (copied to a private inode) right before anything could write to
+  it, i.e. before code runs in either session or an upload replaces it,
+* ``copy`` is the plain fallback when neither is possible (e.g. across
+  filesystems).
+
+``auto`` tries the strategies in that order per file.
+"""
+
+import errno
+import fcntl
+import os
+import shutil
+import uuid
+from typing import Dict
+
+from runtime import session_data
+
+FICLONE = 0x40049409
+
+FORK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+# Errors meaning "this filesystem cannot do that", as opposed to real failures
+_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK)
+
+
+def reflink(src: str, dst: str):
+    """Clone ``src`` into a new file ``dst`` sharing its data blocks."""
+    with open(src, "rb") as fsrc:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, fsrc.fileno())
+        except OSError:
+            os.close(fd)
+            os.remove(dst)
+            raise
+        os.close(fd)
+    shutil.copystat(src, dst)
+
+
+def clone_file(src: str, dst: str, mode: str = "auto") -> str:
+    """Clone a single file and return the strategy that was used."""
+    if mode in ("auto", "reflink"):
+        try:
+            reflink(src, dst)
+            return "reflink"
+        except OSError as e:
+            if mode == "reflink" or e.errno not in _UNSUPPORTED:
+                raise
+    if mode in ("auto", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if mode == "hardlink" or e.errno not in _UNSUPPORTED:
+                raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def fork_session(src_dir: str, dst_dir: str, mode: str = "auto") -> Dict[str, int]:
+    """Clone the session in ``src_dir`` into the new session ``dst_dir``.
+
+    The tree is built in a temporary sibling directory and renamed into place,
+    so a failed fork never leaves a half-populated session behind.  Returns how
+    many files were cloned with each strategy.
+    """
+    if mode not in FORK_MODES:
+        raise ValueError(f"Unsupported fork mode: {mode}")
+    if os.path.exists(dst_dir):
+        raise FileExistsError(dst_dir)
+
+    parent, name = os.path.split(dst_dir)
+    tmp_dir = os.path.join(parent, f".{name}.fork-{uuid.uuid4().hex}")
+    stats = {strategy: 0 for strategy in FORK_MODES[1:]}
+    try:
+        for root, dirs, files in os.walk(src_dir):
+            target_root = os.path.join(tmp_dir, os.path.relpath(root, src_dir))
+            os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                src = os.path.join(root, name)
+                if os.path.islink(src) or not os.path.isfile(src):
+                    continue
+                stats[clone_file(src, os.path.join(target_root, name), mode)] += 1
+        os.rename(tmp_dir, dst_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return stats
+
+
+def detach(file_path: str) -> bool:
+    """Give ``file_path`` a private inode if it is shared with another session.
+
+    Returns whether a copy was made.  Columnar caches are only ever replaced
+    atomically, so they can stay shared.
+    """
+    try:
+        stat = os.lstat(file_path)
+    except FileNotFoundError:
+        return False
+    if stat.st_nlink < 2 or not os.path.isfile(file_path):
+        return False
+    tmp_path = os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        # Never hard-link here: the point is to stop sharing the inode
+        try:
+            reflink(file_path, tmp_path)
+        except OSError:
+            shutil.copy2(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def detach_session(session_dir: str) -> int:
+    """Detach every shared file of a session before code may write to it."""
+    detached = 0
+    for root, dirs, files in os.walk(session_dir):
+        dirs[:] = [d for d in dirs if d != session_data.CACHE_DIRNAME]
+        for name in files:
+            if detach(os.path.join(root, name)):
+                detached += 1
+    return detached
@@ -0,0 +1,147 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import archives
+
+MB = 1024 * 1024
+
+
+def make_zip(files, compression=zipfile.ZIP_DEFLATED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def make_tar(files, mode="w"):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as tf:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def extract(data, dest, max_entry_size=MB, max_total_size=4 * MB, max_entries=100):
+    return archives.extract_archive(io.BytesIO(data), str(dest), max_entry_size=max_entry_size,
+                                    max_total_size=max_total_size, max_entries=max_entries)
+
+
+@pytest.mark.parametrize("data", [
+    make_zip([("a.txt", b"a"), ("dir/b.txt", b"b")]),
+    make_tar([("a.txt", b"a"), ("dir/b.txt", b"b")]),
+    make_tar([("a.txt", b"a"), ("dir/b.txt", b"b")], mode="w:gz"),
+])
+def test_extracts_zip_and_tar(tmp_path, data):
+    assert extract(data, tmp_path) == ["a.txt", "dir/b.txt"]
+    assert (tmp_path / "dir" / "b.txt").read_bytes() == b"b"
+
+
+def test_zip_bomb_is_stopped_by_entry_size_limit(tmp_path):
+    # 8MB of zeros compresses to a few KB
+    bomb = make_zip([("zeros.bin", b"\0" * (8 * MB))])
+    assert len(bomb) < 64 * 1024
+
+    with pytest.raises(archives.ArchiveLimitError):
+        extract(bomb, tmp_path, max_entry_size=MB, max_total_size=64 * MB)
+    # Rejected on the declared size, before anything is written
+    assert not (tmp_path / "zeros.bin").exists()
+
+
+def test_zip_bomb_is_stopped_by_total_limit(tmp_path):
+    bomb = make_zip([(f"part{i}.bin", b"\0" * MB) for i in range(8)])
+
+    with pytest.raises(archives.ArchiveLimitError, match="total size"):
+        extract(bomb, tmp_path, max_entry_size=2 * MB, max_total_size=3 * MB)
+
+
+def test_entry_count_limit(tmp_path):
+    files = [(f"f{i}.txt", b"x") for i in range(11)]
+
+    assert len(extract(make_tar(files[:10]), tmp_path / "ok", max_entries=10)) == 10
+    with pytest.raises(archives.ArchiveLimitError, match="more than 10 entries"):
+        extract(make_tar(files), tmp_path / "over", max_entries=10)
+
+
+def test_entry_count_limit_includes_directories(tmp_path):
+    data = make_zip([(f"d{i}/", b"") for i in range(11)])
+
+    with pytest.raises(archives.ArchiveLimitError):
+        extract(data, tmp_path, max_entries=10)
+
+
+@pytest.mark.parametrize("name", ["../evil.txt", "a/../../evil.txt", "/etc/evil.txt", "C:/evil.txt", "..\\evil.txt"])
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_rejects_paths_escaping_destination(tmp_path, make, name):
+    dest = tmp_path / "dest"
+
+    with pytest.raises(archives.ArchiveFormatError, match="Unsafe path"):
+        extract(make([("ok.txt", b"ok"), (name, b"evil")]), dest)
+    assert not (tmp_path / "evil.txt").exists()
+
+
+def test_tar_links_are_skipped(tmp_path):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tf:
+        link = tarfile.TarInfo("passwd")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "/etc/passwd"
+        tf.addfile(link)
+
+    assert extract(buf.getvalue(), tmp_path) == []
+    assert not os.path.lexists(tmp_path / "passwd")
+
+
+def test_duplicate_entries_are_listed_once(tmp_path):
+    paths = extract(make_tar([("a.txt", b"old"), ("a.txt", b"new")]), tmp_path)
+
+    assert paths == ["a.txt"]
+    assert (tmp_path / "a.txt").read_bytes() == b"new"
+
+
+def test_conflicting_paths_are_rejected(tmp_path):
+    with pytest.raises(archives.ArchiveFormatError, match="Conflicting"):
+        extract(make_tar([("a", b"file"), ("a/b.txt", b"b")]), tmp_path)
+
+
+def test_not_an_archive(tmp_path):
+    with pytest.raises(archives.ArchiveFormatError):
+        extract(b"definitely not an archive" * 100, tmp_path)
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar", "tar.gz"])
+def test_iter_archive_round_trip(tmp_path, archive_format):
+    source = tmp_path / "big.bin"
+    source.write_bytes(os.urandom(3 * archives.CHUNK_SIZE // 2))
+    entries = [
+        archives.ArchiveEntry("big.bin", source.stat().st_size, source.stat().st_mtime,
+                              lambda: archives.iter_file(str(source))),
+        archives.ArchiveEntry("dir/small.txt", 5, 0, lambda: iter([b"hello"])),
+    ]
+    data = b"".join(archives.iter_archive(entries, archive_format))
+
+    dest = tmp_path / "out"
+    assert extract(data, dest, max_entry_size=4 * MB) == ["big.bin", "dir/small.txt"]
+    assert (dest / "big.bin").read_bytes() == source.read_bytes()
+    assert (dest / "dir" / "small.txt").read_bytes() == b"hello"
+
+
+def test_install_keeps_newer_files(tmp_path):
+    staging, dest = tmp_path / "staging", tmp_path / "dest"
+    staging.mkdir()
+    dest.mkdir()
+    (staging / "a.txt").write_text("incoming")
+    (staging / "b.txt").write_text("incoming")
+    os.utime(staging / "a.txt", (1000, 1000))
+    (dest / "a.txt").write_text("local")
+
+    archives.install(str(staging), str(dest), ["a.txt", "b.txt"], keep_newer=True)
+
+    assert (dest / "a.txt").read_text() == "local"
+    assert (dest / "b.txt").read_text() == "incoming"
@@ -0,0 +1,102 @@
+import uuid
+
+from cluster import HashRing, Membership, parse_peers
+
+NODES = ["http://a:8700", "http://b:8700", "http://c:8700"]
+KEYS = [str(uuid.UUID(int=i)) for i in range(5000)]
+
+
+def test_ring_is_independent_of_node_order():
+    ring = HashRing(NODES)
+    shuffled = HashRing(list(reversed(NODES)) + [NODES[0]])
+
+    assert all(ring.owner(key) == shuffled.owner(key) for key in KEYS)
+
+
+def test_ring_spreads_keys_evenly():
+    ring = HashRing(NODES)
+    counts = {node: 0 for node in NODES}
+    for key in KEYS:
+        counts[ring.owner(key)] += 1
+
+    assert all(abs(count - len(KEYS) / 3) < len(KEYS) * 0.1 for count in counts.values())
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(NODES)
+    after = HashRing(NODES + ["http://d:8700"])
+
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    assert all(after.owner(key) == "http://d:8700" for key in moved)
+    # About 1/4 of the keys move to the new node
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_node_only_moves_its_keys():
+    before = HashRing(NODES)
+    after = HashRing(NODES[:2])
+
+    for key in KEYS:
+        if before.owner(key) != NODES[2]:
+            assert after.owner(key) == before.owner(key)
+
+
+def test_empty_ring():
+    assert HashRing([]).owner("session") is None
+
+
+def test_parse_peers():
+    assert parse_peers("http://a:8700/, http://b:8700\nhttp://c:8700  ") == NODES
+    assert parse_peers("") == []
+
+
+def test_peer_joins_on_first_healthy_probe_and_leaves_after_threshold():
+    membership = Membership(NODES[0], NODES[1:], failure_threshold=3)
+    assert membership.live_members() == [NODES[0]]
+
+    assert membership.update({NODES[1]: True, NODES[2]: False})
+    assert membership.live_members() == NODES[:2]
+
+    # A peer only drops out after three failed probes in a row
+    assert not membership.update({NODES[1]: False, NODES[2]: False})
+    assert not membership.update({NODES[1]: False, NODES[2]: False})
+    assert membership.update({NODES[1]: False, NODES[2]: False})
+    assert membership.live_members() == [NODES[0]]
+
+
+def test_members_agree_on_owners():
+    views = [Membership(node, [peer for peer in NODES if peer != node]) for node in NODES]
+    for membership in views:
+        membership.update({peer: True for peer in membership.configured_peers()})
+
+    for key in KEYS[:500]:
+        assert len({membership.owner(key) for membership in views}) == 1
+
+
+def test_leave_hands_all_sessions_to_peers():
+    membership = Membership(NODES[0], NODES[1:])
+    membership.update({NODES[1]: True, NODES[2]: True})
+
+    membership.leave()
+    assert NODES[0] not in membership.live_members()
+    assert all(membership.owner(key) != NODES[0] for key in KEYS[:500])
+    # Probes while leaving do not bring this node back
+    membership.update({NODES[1]: True, NODES[2]: True})
+    assert NODES[0] not in membership.live_members()
+
+
+def test_new_session_ids_are_owned_locally():
+    membership = Membership(NODES[0], NODES[1:])
+    membership.update({NODES[1]: True, NODES[2]: True})
+
+    assert all(membership.is_local(membership.new_session_id()) for _ in range(50))
+
+
+def test_peers_file_is_reread(tmp_path):
+    peers_file = tmp_path / "peers"
+    peers_file.write_text(NODES[1])
+    membership = Membership(NODES[0], [], peers_file=str(peers_file))
+    assert membership.configured_peers() == [NODES[1]]
+
+    peers_file.write_text("\n".join(NODES))
+    assert membership.configured_peers() == NODES[1:]
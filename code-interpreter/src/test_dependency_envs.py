@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from dependency_envs import DependencyEnvs, DependencyError, environment_key, normalize, tree_fingerprint
+
+
+def test_normalize_sorts_and_canonicalizes():
+    assert normalize("py", ["Pandas==2.2.*", "numpy", "typing_extensions>=4"]) == \
+        ["numpy", "pandas==2.2.*", "typing-extensions>=4"]
+    assert environment_key("py", ["numpy", "pandas"]) == environment_key("py", ["pandas", "numpy"])
+
+
+@pytest.mark.parametrize("requirement", ["--index-url=http://evil", "../pkg", "git+https://x/y", "pkg; rm -rf /"])
+def test_normalize_rejects_options_paths_and_urls(requirement):
+    with pytest.raises(DependencyError):
+        normalize("py", [requirement])
+
+
+def test_fingerprint_detects_writes_even_with_restored_mtime(tmp_path):
+    module = tmp_path / "pkg" / "module.py"
+    module.parent.mkdir()
+    module.write_text("x = 1\n")
+    before = tree_fingerprint(str(tmp_path))
+    assert tree_fingerprint(str(tmp_path)) == before
+
+    stat = os.stat(module)
+    module.write_text("x = 2\n")
+    os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert tree_fingerprint(str(tmp_path)) != before
+
+
+def test_fingerprint_detects_new_files(tmp_path):
+    before = tree_fingerprint(str(tmp_path))
+    (tmp_path / "evil.py").write_text("")
+    assert tree_fingerprint(str(tmp_path)) != before
+
+
+@pytest.fixture
+def envs(tmp_path, monkeypatch):
+    envs = DependencyEnvs(str(tmp_path / "envs"), str(tmp_path), str(tmp_path), capacity=1 << 30,
+                          verify_interval=3600)
+    builds = []
+
+    def fake_pip(tmp_path, requirements):
+        builds.append(requirements)
+        script = "import os; os.makedirs('site-packages/pkg'); open('site-packages/pkg/mod.py', 'w').write('x = 1')"
+        return [sys.executable, "-c", script]
+
+    monkeypatch.setattr(envs, "_pip_command", fake_pip)
+    envs.builds = builds
+    return envs
+
+
+def write(layer, name, text):
+    # Layers are read-only; user code running as root writes anyway
+    path = os.path.join(layer.path, name)
+    os.chmod(path if os.path.exists(path) else os.path.dirname(path), 0o755)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_layer_is_reused_until_modified(envs):
+    layer = envs.acquire("py", ["pkg"])
+    envs.release(layer)
+    assert envs.acquire("py", ["pkg"]) == layer
+    envs.release(layer)
+    assert len(envs.builds) == 1
+
+    # A new file changes the package directory, which every acquire checks
+    write(layer, "pkg/evil.py", "")
+    envs.release(envs.acquire("py", ["pkg"]))
+    assert len(envs.builds) == 2
+    assert not os.path.exists(os.path.join(layer.path, "pkg", "evil.py"))
+
+
+def test_full_check_runs_once_per_interval(envs):
+    layer = envs.acquire("py", ["pkg"])
+    envs.release(layer)
+    write(layer, "pkg/mod.py", "x = 2")
+
+    envs.release(envs.acquire("py", ["pkg"]))
+    assert len(envs.builds) == 1
+
+    envs.verify_interval = 0
+    envs.release(envs.acquire("py", ["pkg"]))
+    assert len(envs.builds) == 2
+
+
+def test_modified_layer_is_kept_while_in_use(envs):
+    layer = envs.acquire("py", ["pkg"])
+    write(layer, "pkg/evil.py", "")
+
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(envs.acquire("py", ["pkg"])))
+    waiter.start()
+    waiter.join(0.3)
+    # The run holding the layer can still import from it
+    assert waiter.is_alive()
+    assert os.path.isfile(os.path.join(layer.path, "pkg", "mod.py"))
+
+    envs.release(layer)
+    waiter.join(5)
+    assert acquired == [layer]
+    assert len(envs.builds) == 2
+    assert not os.path.exists(os.path.join(layer.path, "pkg", "evil.py"))
+    envs.release(acquired[0])
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import profiling
+
+PERF_SCRIPT = """\
+prog 1234 100.000001:     250000 cpu-clock:
+\t    55d0c0de1139 work+0x10 (/tmp/s/code)
+\t    55d0c0de1180 main+0x20 (/tmp/s/code)
+\t    7f3a1c029d90 __libc_start_call_main+0x80 (/usr/lib/libc.so.6)
+
+prog 1234 100.000002:     250000 cpu-clock:
+\t    55d0c0de1139 work+0x10 (/tmp/s/code)
+\t    55d0c0de1180 main+0x20 (/tmp/s/code)
+\t    7f3a1c029d90 __libc_start_call_main+0x80 (/usr/lib/libc.so.6)
+
+prog 1234 100.000003:     250000 cpu-clock:
+\t    55d0c0de1190 main+0x30 (/tmp/s/code)
+\t    7f3a1c029d90 __libc_start_call_main+0x80 (/usr/lib/libc.so.6)
+
+prog 1234 100.000004:     250000 cpu-clock:
+\t    ffffffff81000000 [unknown] ([kernel.kallsyms])
+"""
+
+COUNTS = {"main;work;inner": 6, "main;work": 2, "main": 2}
+
+
+def test_collapse_perf(tmp_path, monkeypatch):
+    def fake_run(command, **kwargs):
+        assert command[:2] == ["perf", "script"] and kwargs["cwd"] == str(tmp_path)
+        return subprocess.CompletedProcess(command, 0, stdout=PERF_SCRIPT, stderr="")
+
+    monkeypatch.setattr(profiling.subprocess, "run", fake_run)
+
+    assert profiling.collapse_perf(str(tmp_path)) == {
+        "__libc_start_call_main;main;work": 2,
+        "__libc_start_call_main;main": 1,
+        "[unknown]": 1,
+    }
+
+
+def test_collapsed_round_trip(tmp_path):
+    path = str(tmp_path / profiling.COLLAPSED_NAME)
+    profiling.write_collapsed(path, COUNTS)
+
+    assert profiling.read_collapsed(path) == COUNTS
+
+
+def test_hotspots():
+    spots = profiling.hotspots(COUNTS, top_n=2)
+
+    assert [spot["function"] for spot in spots] == ["inner", "work"]
+    assert spots[0] == {"function": "inner", "self_samples": 6, "self_percent": 60.0, "total_percent": 60.0}
+    # "work" is on the stack of 8 of 10 samples but only 2 are its own
+    assert spots[1]["self_percent"] == 20.0 and spots[1]["total_percent"] == 80.0
+
+
+def test_render_flamegraph():
+    svg = profiling.render_flamegraph({**COUNTS, "main;<lambda> & co": 1}, title="Profile of code.py")
+    root = ET.fromstring(svg)
+
+    titles = [el.text for el in root.iter("{http://www.w3.org/2000/svg}title")]
+    assert "main (11 samples, 100.00%)" in titles
+    assert "inner (6 samples, 54.55%)" in titles
+    assert "<lambda> & co (1 samples, 9.09%)" in titles
+
+
+def test_render_empty_profile():
+    ET.fromstring(profiling.render_flamegraph({}))
+
+
+def test_sampling_profiler(tmp_path):
+    script = tmp_path / "code.py"
+    script.write_text(
+        "import time\n"
+        "def busy():\n"
+        "    end = time.time() + 0.3\n"
+        "    while time.time() < end:\n"
+        "        pass\n"
+        "busy()\n"
+        "print('done')\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(profiling.__file__), "runtime"))
+    result = subprocess.run(
+        [sys.executable, "-m", "sampling_profiler", "--output", profiling.COLLAPSED_NAME,
+         "--interval", "0.005", "code.py"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=30
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "done\n"
+    summary = profiling.finalize(str(tmp_path), "py", top_n=5)
+    assert summary["status"] == "ok" and summary["samples"] > 10
+    assert summary["hotspots"][0]["function"].startswith("busy (code.py:2)")
+    assert (tmp_path / profiling.FLAMEGRAPH_NAME).exists()
+
+
+def test_sampling_profiler_deadline(tmp_path):
+    script = tmp_path / "code.py"
+    script.write_text("import time\ntime.sleep(30)\n")
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(profiling.__file__), "runtime"))
+    result = subprocess.run(
+        [sys.executable, "-m", "sampling_profiler", "--output", profiling.COLLAPSED_NAME,
+         "--deadline", "0.5", "code.py"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=30
+    )
+
+    assert result.returncode == 124
+    assert profiling.read_collapsed(str(tmp_path / profiling.COLLAPSED_NAME))
@@ -0,0 +1,107 @@
+import datetime
+import json
+import os
+
+import pyarrow as pa
+import pytest
+
+from semantic import SemanticModelError, evaluate_model, required_columns
+
+CHART_SCHEMA = os.path.join(os.path.dirname(__file__), "..", "test_case", "chart_schema.json")
+
+
+@pytest.fixture
+def model():
+    with open(CHART_SCHEMA) as f:
+        schema = json.load(f)
+    return schema.get("semanticModel", schema)
+
+
+@pytest.fixture
+def billing():
+    dates = [
+        datetime.date(2025, 5, 31),
+        datetime.date(2025, 6, 1),
+        datetime.date(2025, 6, 1),
+        datetime.date(2025, 6, 2),
+        datetime.date(2025, 6, 3),
+        datetime.date(2025, 6, 4),
+        datetime.date(2025, 7, 1),
+    ]
+    return pa.table({
+        "date": pa.array(dates),
+        "extended_cost": [22.5, 10.0, 10.0, 50.0, 50.0, 10.0, 999.0],
+        "service": ["vm", "vm", "db", "vm", "db", "vm", "vm"],
+    })
+
+
+def test_chart_schema_lag_case_between(model, billing):
+    columns, rows = evaluate_model(billing, model)
+
+    assert columns == ["date", "extended_cost", "cost_ratio_change", "anomaly_flag"]
+    # between keeps June only, including both bounds' days; same-day rows are summed
+    assert [row["date"] for row in rows] == ["2025-06-01", "2025-06-02", "2025-06-03", "2025-06-04"]
+    assert [row["extended_cost"] for row in rows] == [20.0, 50.0, 50.0, 10.0]
+    # lag() on the first day of the range reads the day before it, as in chart_code.html
+    assert [round(row["cost_ratio_change"], 2) for row in rows] == [0.89, 2.5, 1.0, 0.2]
+    assert [row["anomaly_flag"] for row in rows] == [0, 1, 0, 1]
+
+
+def test_string_dates_are_filtered_like_dates(model):
+    table = pa.table({"date": ["2025-05-31", "2025-06-01", "2025-06-02"], "extended_cost": [5.0, 1.0, 2.0]})
+
+    _, rows = evaluate_model(table, model)
+
+    assert [(row["date"], row["cost_ratio_change"]) for row in rows] == [("2025-06-01", 0.2), ("2025-06-02", 2.0)]
+
+
+def test_first_day_without_previous_data_has_no_lag(model, billing):
+    _, rows = evaluate_model(billing.slice(1), model)
+
+    assert [row["cost_ratio_change"] for row in rows][:2] == [None, 2.5]
+
+
+def test_extra_filters_and_measure_subset(model, billing):
+    columns, rows = evaluate_model(
+        billing,
+        model,
+        measures=["extended_cost"],
+        filters=[{"column": "service", "operator": "=", "values": ["vm"]}],
+    )
+
+    assert columns == ["date", "extended_cost"]
+    assert [row["extended_cost"] for row in rows] == [10.0, 50.0, 10.0]
+
+
+def test_order_by_and_limit(model, billing):
+    _, rows = evaluate_model(billing, model, order_by=["extended_cost desc"], limit=2)
+
+    assert [row["extended_cost"] for row in rows] == [50.0, 50.0]
+
+
+def test_unknown_measure(model, billing):
+    with pytest.raises(SemanticModelError):
+        evaluate_model(billing, model, measures=["missing"])
+
+
+@pytest.mark.parametrize("table", [
+    pa.table({"date": ["06/01/2025"], "extended_cost": [1.0]}),
+    pa.table({"date": ["2025-06-01"], "extended_cost": ["1.0"]}),
+])
+def test_bad_source_values_are_model_errors(model, table):
+    with pytest.raises(SemanticModelError):
+        evaluate_model(table, model)
+
+
+@pytest.mark.parametrize("flt", [
+    {"column": "date", "operator": ">", "values": ["June"]},
+    {"column": "extended_cost", "operator": ">", "values": ["lots"]},
+])
+def test_bad_filter_value_is_a_model_error(model, billing, flt):
+    with pytest.raises(SemanticModelError):
+        evaluate_model(billing, model, filters=[flt])
+
+
+def test_required_columns(model):
+    assert required_columns(model, [{"column": "service", "values": ["vm"]}]) == \
+        ["date", "extended_cost", "service"]
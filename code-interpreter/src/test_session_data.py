@@ -0,0 +1,28 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from runtime import session_data
+
+
+def test_cache_is_rebuilt_when_source_changes(tmp_path):
+    source = tmp_path / "data.csv"
+    source.write_text("a,b\n1,2\n")
+
+    assert session_data.read_table(str(source)).to_pydict() == {"a": [1], "b": [2]}
+    assert session_data.is_fresh(str(source))
+
+    source.write_text("a,b\n1,2\n3,4\n")
+    assert not session_data.is_fresh(str(source))
+    assert session_data.read_table(str(source)).to_pydict() == {"a": [1, 3], "b": [2, 4]}
+
+
+def test_concurrent_conversions_of_one_file(tmp_path):
+    source = tmp_path / "data.csv"
+    source.write_text("a,b\n" + "1,2\n" * 10000)
+
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda _: session_data.convert(str(source)), range(32)))
+
+    assert set(paths) == {session_data.cache_path(str(source))}
+    assert session_data.is_fresh(str(source))
+    assert os.listdir(tmp_path / session_data.CACHE_DIRNAME) == ["data.csv.arrow"]
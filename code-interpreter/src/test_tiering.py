@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import tiering
+
+
+@pytest.fixture
+def tiers(tmp_path):
+    hot_dir = tmp_path / "hot"
+    (hot_dir / "s1").mkdir(parents=True)
+    (hot_dir / "s1" / "data.csv").write_text("a,b\n1,2\n")
+    store = tiering.SessionTiers(str(hot_dir), str(tmp_path / "cold"), idle_seconds=60)
+    store._last_access["s1"] = time.time() - 120
+    return store
+
+
+def test_archive_and_rehydrate(tiers):
+    assert tiers.archive("s1")
+    assert tiers.is_cold("s1")
+    assert [entry["name"] for entry in tiers.list_cold_files("s1")] == ["data.csv"]
+
+    assert tiers.acquire("s1")
+    tiers.release("s1")
+    assert not tiers.is_cold("s1")
+    with open(os.path.join(tiers.hot_dir, "s1", "data.csv")) as f:
+        assert f.read() == "a,b\n1,2\n"
+
+
+def test_cold_file_stays_readable_after_rehydration(tiers):
+    assert tiers.open_cold_file("s1", "data.csv") is None
+    assert tiers.archive("s1")
+    assert tiers.open_cold_file("s1", "missing.csv") is None
+
+    entry, blob = tiers.open_cold_file("s1", "data.csv")
+    # A concurrent /exec rehydrates the session, deleting the archive
+    tiers.acquire("s1")
+    tiers.release("s1")
+    assert not tiers.is_cold("s1")
+
+    assert b"".join(tiering.iter_blob(blob)) == b"a,b\n1,2\n"
+    assert entry["size"] == 8
+
+
+def test_archive_skips_sessions_in_use(tiers):
+    assert not tiers.acquire("s1")
+    tiers._last_access["s1"] = time.time() - 120
+
+    assert not tiers.archive("s1")
+    tiers.release("s1")
+    assert os.path.isdir(os.path.join(tiers.hot_dir, "s1"))
+
+
+def test_archive_keeps_session_accessed_while_compressing(tiers, monkeypatch):
+    compress = tiering._compress
+
+    def compress_and_touch(src, dst, codec):
+        compress(src, dst, codec)
+        tiers.touch("s1")
+
+    monkeypatch.setattr(tiering, "_compress", compress_and_touch)
+
+    assert not tiers.archive("s1")
+    assert os.path.isfile(os.path.join(tiers.hot_dir, "s1", "data.csv"))
+    assert not os.listdir(tiers.cold_dir)
+
+
+def test_remove_if_unused(tiers):
+    last_access = tiers.last_access("s1")
+    assert not tiers.acquire("s1")
+    assert not tiers.remove_if_unused("s1", tiers.last_access("s1"))
+    tiers.release("s1")
+    # Accessed since ``last_access`` was read
+    assert not tiers.remove_if_unused("s1", last_access)
+
+    assert tiers.remove_if_unused("s1", tiers.last_access("s1"))
+    assert not tiers.exists("s1")
@@ -0,0 +1,105 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+import tiering
+from workspaces import Workspaces, remove_session_dir
+
+
+@pytest.fixture
+def workspaces(tmp_path):
+    disk_dir, ram_dir = tmp_path / "disk", tmp_path / "ram"
+    disk_dir.mkdir()
+    return Workspaces(str(disk_dir), str(ram_dir), mode="ram", capacity=1024 * 1024,
+                      session_limit=256 * 1024, idle_seconds=3600)
+
+
+def write(workspaces, session_id, size):
+    with open(os.path.join(workspaces.ensure(session_id), "data.bin"), "wb") as f:
+        f.write(os.urandom(size))
+    workspaces.measure(session_id)
+
+
+def test_new_sessions_go_to_ram(workspaces):
+    write(workspaces, "s1", 64 * 1024)
+
+    assert workspaces.is_ram("s1")
+    assert workspaces.stats()["used"] >= 64 * 1024
+
+
+def test_oversized_session_is_spilled(workspaces):
+    write(workspaces, "s1", 512 * 1024)
+
+    assert not workspaces.is_ram("s1")
+    assert os.path.getsize(os.path.join(workspaces.path("s1"), "data.bin")) == 512 * 1024
+    assert workspaces.stats()["used"] == 0
+
+
+def test_acquired_session_is_not_spilled(workspaces):
+    write(workspaces, "s1", 64 * 1024)
+
+    workspaces.acquire("s1")
+    assert not workspaces.spill("s1")
+    workspaces.release("s1")
+    assert workspaces.spill("s1")
+
+
+def test_removed_sessions_stop_counting(workspaces, tmp_path):
+    tiers = tiering.SessionTiers(workspaces.disk_dir, str(tmp_path / "cold"), idle_seconds=0,
+                                 on_remove=workspaces.forget)
+    for session_id in ("s1", "s2", "s3"):
+        write(workspaces, session_id, 64 * 1024)
+
+    tiers.remove("s1")
+    assert set(workspaces.stats()["sessions"]) == {"s2", "s3"}
+
+    # Removed behind the workspaces' back: dropped on the next rebalance
+    remove_session_dir(workspaces.path("s2"))
+    workspaces.rebalance()
+    assert set(workspaces.stats()["sessions"]) == {"s3"}
+
+
+def test_rebalance_spills_least_recently_used_over_capacity(workspaces):
+    for session_id in ("old", "new"):
+        write(workspaces, session_id, 128 * 1024)
+    workspaces._last_used["old"] -= 60
+    workspaces.capacity = 200 * 1024
+
+    assert workspaces.rebalance() >= 1
+    assert not workspaces.is_ram("old")
+
+
+def test_spill_copies_without_blocking_other_sessions(workspaces, monkeypatch):
+    write(workspaces, "s1", 64 * 1024)
+    write(workspaces, "s2", 64 * 1024)
+    copying, resume = threading.Event(), threading.Event()
+    copytree = shutil.copytree
+
+    def slow_copytree(*args, **kwargs):
+        copying.set()
+        resume.wait(5)
+        return copytree(*args, **kwargs)
+
+    monkeypatch.setattr(shutil, "copytree", slow_copytree)
+    spill = threading.Thread(target=workspaces.spill, args=("s1",))
+    spill.start()
+    assert copying.wait(5)
+
+    # Other sessions are not held up by the copy...
+    workspaces.acquire("s2")
+    workspaces.release("s2")
+    workspaces.ensure("s3")
+    # ...but the session being spilled waits for it to finish
+    acquired = threading.Event()
+    writer = threading.Thread(target=lambda: (workspaces.acquire("s1"), acquired.set()))
+    writer.start()
+    assert not acquired.wait(0.2)
+
+    resume.set()
+    spill.join(5)
+    writer.join(5)
+    assert acquired.is_set()
+    assert not workspaces.is_ram("s1")
+    workspaces.release("s1")
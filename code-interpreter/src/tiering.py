@@ -0,0 +1,306 @@
+"""Hot/cold tiering of session directories.
+
+Sessions that have not been accessed for ``idle_seconds`` are moved from the
+hot execution directory to a cold directory, typically on cheaper storage::
+
+    <cold_dir>/<session_id>/manifest.json
+    <cold_dir>/<session_id>/0000000.zst
+    <cold_dir>/<session_id>/0000001.zst
+    ...
+
+Every file is compressed on its own (zstd when ``zstandard`` is installed,
+gzip otherwise, stored as-is when already compressed) so a single file can
+be streamed out of a cold session without unpacking the rest.  The manifest
+keeps each file's relative path, size and mtime, which is enough to list a
+cold session.  Columnar caches are not archived; they are rebuilt on demand.
+
+Any access that writes to (or walks) the hot directory brackets it with
+:meth:`SessionTiers.acquire` and :meth:`SessionTiers.release`.  ``acquire``
+extracts the whole session back into the hot directory if it is cold, and a
+session that is acquired is never archived.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from runtime import session_data
+from workspaces import remove_session_dir
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+# Formats that are already compressed and are not worth recompressing
+INCOMPRESSIBLE_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip", ".gz", ".tgz", ".bz2",
+    ".xz", ".zst", ".7z", ".parquet", ".xlsx", ".docx", ".pptx", ".mp3", ".mp4", ".pdf",
+)
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _compress(src: str, dst: str, codec: str):
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        if codec == "zstd":
+            zstandard.ZstdCompressor(level=3).copy_stream(fin, fout)
+        elif codec == "gzip":
+            with gzip.GzipFile(fileobj=fout, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(fin, gz, CHUNK_SIZE)
+        else:
+            shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+
+
+def _open_blob(path: str, codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this cold session")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_blob(f: BinaryIO) -> Iterator[bytes]:
+    """Read an open blob in chunks, closing it at the end."""
+    with f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class SessionTiers:
+    """Track session access times and move sessions between tiers."""
+
+    def __init__(self, hot_dir: str, cold_dir: str, idle_seconds: int,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        self.hot_dir = hot_dir
+        self.cold_dir = cold_dir
+        self.idle_seconds = idle_seconds
+        # Called with the session ID whenever a hot directory is deleted
+        self.on_remove = on_remove
+        self._last_access: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(cold_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_seconds > 0
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _cold_path(self, session_id: str) -> str:
+        return os.path.join(self.cold_dir, session_id)
+
+    def touch(self, session_id: str):
+        self._last_access[session_id] = time.time()
+
+    def is_cold(self, session_id: str) -> bool:
+        return not os.path.isdir(os.path.join(self.hot_dir, session_id)) and \
+            os.path.isfile(os.path.join(self._cold_path(session_id), MANIFEST_NAME))
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.isdir(os.path.join(self.hot_dir, session_id)) or self.is_cold(session_id)
+
+    # Cold reads
+
+    def manifest(self, session_id: str) -> Dict[str, dict]:
+        with open(os.path.join(self._cold_path(session_id), MANIFEST_NAME)) as f:
+            return json.load(f)["files"]
+
+    def list_cold_files(self, session_id: str) -> List[dict]:
+        """``get_file_info``-style entries for the top-level files of a cold session."""
+        return [
+            {"name": path, "size": entry["size"], "mtime": entry["mtime"]}
+            for path, entry in self.manifest(session_id).items()
+            if "/" not in path
+        ]
+
+    def iter_cold_file(self, session_id: str, name: str) -> Iterator[bytes]:
+        """Stream one file out of a cold session without extracting the others."""
+        entry = self.manifest(session_id)[name]
+        return iter_blob(_open_blob(os.path.join(self._cold_path(session_id), entry["blob"]), entry["codec"]))
+
+    def open_cold_file(self, session_id: str, name: str) -> Optional[Tuple[dict, BinaryIO]]:
+        """Open one file of a cold session; ``None`` if the session is not cold or lacks it.
+
+        The handle stays readable if the session is rehydrated meanwhile, so
+        a response can be streamed from it after the session lock is dropped.
+        """
+        with self._lock(session_id):
+            if not self.is_cold(session_id):
+                return None
+            entry = self.manifest(session_id).get(name)
+            if entry is None:
+                return None
+            return entry, _open_blob(os.path.join(self._cold_path(session_id), entry["blob"]), entry["codec"])
+
+    # Tier transitions
+
+    def acquire(self, session_id: str) -> bool:
+        """Mark ``session_id`` in use, rehydrating it if it is cold; returns whether it was.
+
+        Waits for an archive of the session that is in progress.  Every call
+        must be paired with :meth:`release`.
+        """
+        with self._lock(session_id):
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+            self.touch(session_id)
+            try:
+                return self._rehydrate(session_id)
+            except BaseException:
+                self._release(session_id)
+                raise
+
+    def release(self, session_id: str):
+        with self._lock(session_id):
+            self._release(session_id)
+
+    def _release(self, session_id: str):
+        self._active[session_id] -= 1
+        if not self._active[session_id]:
+            del self._active[session_id]
+        self.touch(session_id)
+
+    def in_use(self, session_id: str) -> bool:
+        return session_id in self._active
+
+    def last_access(self, session_id: str) -> Optional[float]:
+        return self._last_access.get(session_id)
+
+    def _rehydrate(self, session_id: str) -> bool:
+        # Called with the session lock held
+        if not self.is_cold(session_id):
+            return False
+        cold_path = self._cold_path(session_id)
+        hot_path = os.path.join(self.hot_dir, session_id)
+        tmp_path = os.path.join(self.hot_dir, f".{session_id}.rehydrate-{uuid.uuid4().hex}")
+        try:
+            for path, entry in self.manifest(session_id).items():
+                target = os.path.join(tmp_path, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with _open_blob(os.path.join(cold_path, entry["blob"]), entry["codec"]) as fin, \
+                        open(target, "wb") as fout:
+                    shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+                os.utime(target, (entry["mtime"], entry["mtime"]))
+            os.makedirs(tmp_path, exist_ok=True)
+            os.rename(tmp_path, hot_path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        shutil.rmtree(cold_path, ignore_errors=True)
+        return True
+
+    def archive(self, session_id: str) -> bool:
+        """Move an idle hot session to the cold tier; returns whether it moved."""
+        hot_path = os.path.join(self.hot_dir, session_id)
+        with self._lock(session_id):
+            if self.in_use(session_id) or not os.path.isdir(hot_path) or \
+                    self.idle_for(session_id) < self.idle_seconds:
+                return False
+            last_access = self._last_access.get(session_id)
+            cold_path = self._cold_path(session_id)
+            tmp_path = os.path.join(self.cold_dir, f".{session_id}.archive-{uuid.uuid4().hex}")
+            os.makedirs(tmp_path)
+            files = {}
+            try:
+                for root, dirs, names in os.walk(hot_path):
+                    dirs[:] = [d for d in dirs if d != session_data.CACHE_DIRNAME]
+                    for name in sorted(names):
+                        src = os.path.join(root, name)
+                        if os.path.islink(src) or not os.path.isfile(src):
+                            continue
+                        stat = os.stat(src)
+                        codec = "none" if name.lower().endswith(INCOMPRESSIBLE_EXTENSIONS) else _default_codec()
+                        blob = f"{len(files):07d}" + {"zstd": ".zst", "gzip": ".gz"}.get(codec, "")
+                        _compress(src, os.path.join(tmp_path, blob), codec)
+                        files[os.path.relpath(src, hot_path).replace(os.sep, "/")] = {
+                            "blob": blob, "codec": codec, "size": stat.st_size, "mtime": stat.st_mtime,
+                        }
+                with open(os.path.join(tmp_path, MANIFEST_NAME), "w") as f:
+                    json.dump({"session_id": session_id, "archived_at": time.time(), "files": files}, f)
+                # Readers only touch() the session without acquiring it; keep it if one came by
+                if self._last_access.get(session_id) != last_access:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    return False
+                shutil.rmtree(cold_path, ignore_errors=True)
+                os.rename(tmp_path, cold_path)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            self._remove_hot(session_id)
+            self._last_access.pop(session_id, None)
+            return True
+
+    def remove(self, session_id: str):
+        """Delete a session from both tiers."""
+        with self._lock(session_id):
+            self._remove_hot(session_id)
+            shutil.rmtree(self._cold_path(session_id), ignore_errors=True)
+            self._last_access.pop(session_id, None)
+
+    def remove_if_unused(self, session_id: str, last_access: Optional[float]) -> bool:
+        """Delete a session unless it is in use or was accessed since ``last_access`` was read."""
+        with self._lock(session_id):
+            if self.in_use(session_id) or self._last_access.get(session_id) != last_access:
+                return False
+            self._remove_hot(session_id)
+            shutil.rmtree(self._cold_path(session_id), ignore_errors=True)
+            self._last_access.pop(session_id, None)
+            return True
+
+    def _remove_hot(self, session_id: str):
+        remove_session_dir(os.path.join(self.hot_dir, session_id))
+        if self.on_remove is not None:
+            self.on_remove(session_id)
+
+    def session_ids(self) -> List[str]:
+        """IDs of all hot and cold sessions."""
+        hot = [name for name in os.listdir(self.hot_dir)
+               if not name.startswith(".") and os.path.isdir(os.path.join(self.hot_dir, name))]
+        cold = [name for name in os.listdir(self.cold_dir)
+                if not name.startswith(".") and os.path.isfile(os.path.join(self._cold_path(name), MANIFEST_NAME))]
+        return sorted(set(hot) | set(cold))
+
+    def idle_for(self, session_id: str) -> float:
+        """Seconds since the session was last accessed (or modified, if unknown)."""
+        last = self._last_access.get(session_id)
+        if last is None:
+            last = 0.0
+            for root, dirs, names in os.walk(os.path.join(self.hot_dir, session_id)):
+                for name in names + [root]:
+                    try:
+                        last = max(last, os.stat(os.path.join(root, name)).st_mtime)
+                    except OSError:
+                        pass
+            self._last_access[session_id] = last
+        return time.time() - last
+
+    def sweep(self) -> List[str]:
+        """Archive every idle hot session and return the IDs that were moved."""
+        archived = []
+        if not self.enabled:
+            return archived
+        for session_id in os.listdir(self.hot_dir):
+            if session_id.startswith(".") or not os.path.isdir(os.path.join(self.hot_dir, session_id)):
+                continue
+            if self.idle_for(session_id) >= self.idle_seconds and self.archive(session_id):
+                archived.append(session_id)
+        return archived
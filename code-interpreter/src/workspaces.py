@@ -0,0 +1,254 @@
+"""RAM-backed session workspaces with spill-to-disk.
+
+In ``ram`` mode a new session directory is created on a tmpfs (``ram_dir``,
+``/dev/shm`` by default) and ``<disk_dir>/<session_id>`` becomes a symlink to
+it, so every path built from the execution directory keeps working while
+short runs never touch the disk.
+
+A RAM session is spilled, i.e. moved to a real directory under ``disk_dir``,
+when:
+
+* it grows past ``session_limit`` bytes (checked after every run/upload),
+* it has been idle for ``idle_seconds``,
+* the RAM tier as a whole exceeds ``capacity`` (least recently used first).
+
+Usage is measured in allocated blocks, which on tmpfs is the memory the
+session actually pins.  Sessions between :meth:`Workspaces.acquire` and
+:meth:`Workspaces.release` are never spilled, so writers bracket their
+writes with them.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, Set
+
+import session_fork
+
+WORKSPACE_MODES = ("disk", "ram")
+
+
+def tree_usage(path: str) -> int:
+    """Bytes allocated by the files below ``path``."""
+    total = 0
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def remove_session_dir(path: str):
+    """Remove a session directory, following a RAM workspace symlink."""
+    if os.path.islink(path):
+        target = os.path.realpath(path)
+        os.remove(path)
+        shutil.rmtree(target, ignore_errors=True)
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class Workspaces:
+    """Place session directories on disk or in RAM and track RAM usage."""
+
+    def __init__(self, disk_dir: str, ram_dir: str, mode: str = "disk", capacity: int = 0,
+                 session_limit: int = 0, idle_seconds: int = 0):
+        if mode not in WORKSPACE_MODES:
+            raise ValueError(f"Unsupported workspace mode: {mode}")
+        self.disk_dir = disk_dir
+        self.ram_dir = ram_dir
+        self.mode = mode
+        self.capacity = capacity
+        self.session_limit = session_limit
+        self.idle_seconds = idle_seconds
+        self._usage: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._spilling: Set[str] = set()
+        self._lock = threading.RLock()
+        self._spilled = threading.Condition(self._lock)
+        if self.enabled:
+            os.makedirs(ram_dir, exist_ok=True)
+            self._recover()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "ram"
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.disk_dir, session_id)
+
+    def is_ram(self, session_id: str) -> bool:
+        return os.path.islink(self.path(session_id))
+
+    def _recover(self):
+        """Drop links whose RAM directory vanished (e.g. after a reboot)."""
+        for name in os.listdir(self.disk_dir):
+            link = self.path(name)
+            if os.path.islink(link) and not os.path.isdir(link):
+                os.remove(link)
+        for name in os.listdir(self.ram_dir):
+            link = self.path(name)
+            if not (os.path.islink(link) and os.path.realpath(link) == os.path.realpath(os.path.join(self.ram_dir, name))):
+                shutil.rmtree(os.path.join(self.ram_dir, name), ignore_errors=True)
+
+    def ram_used(self) -> int:
+        with self._lock:
+            return sum(self._usage.values())
+
+    def ensure(self, session_id: str) -> str:
+        """Return the directory of ``session_id``, creating it (in RAM if possible)."""
+        session_dir = self.path(session_id)
+        with self._lock:
+            if os.path.isdir(session_dir):
+                return session_dir
+            if self.enabled and self.ram_used() + self.session_limit <= self.capacity:
+                ram_path = os.path.join(self.ram_dir, session_id)
+                os.makedirs(ram_path, exist_ok=True)
+                os.symlink(ram_path, session_dir)
+                self._usage[session_id] = 0
+                self._last_used[session_id] = time.time()
+            else:
+                os.makedirs(session_dir, exist_ok=True)
+        return session_dir
+
+    def fork(self, session_id: str, new_session_id: str, mode: str = "auto") -> Dict[str, int]:
+        """Fork a session, keeping forks of RAM sessions in RAM so links stay cheap.
+
+        Copies without holding the lock; the caller keeps ``session_id``
+        acquired so that it is not spilled meanwhile.
+        """
+        src_dir = os.path.realpath(self.path(session_id))
+        dst_dir = self.path(new_session_id)
+        if os.path.lexists(dst_dir):
+            raise FileExistsError(dst_dir)
+        if not (self.enabled and self.is_ram(session_id)):
+            return session_fork.fork_session(src_dir, dst_dir, mode=mode)
+        ram_path = os.path.join(self.ram_dir, new_session_id)
+        stats = session_fork.fork_session(src_dir, ram_path, mode=mode)
+        try:
+            os.symlink(ram_path, dst_dir)
+        except BaseException:
+            shutil.rmtree(ram_path, ignore_errors=True)
+            raise
+        with self._lock:
+            self._usage[new_session_id] = 0
+            self._last_used[new_session_id] = time.time()
+        return stats
+
+    def acquire(self, session_id: str):
+        """Keep ``session_id`` from being spilled until :meth:`release`.
+
+        Waits for a spill that is in progress, so call it off the event loop.
+        """
+        with self._lock:
+            while session_id in self._spilling:
+                self._spilled.wait()
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+
+    def release(self, session_id: str):
+        with self._lock:
+            self._active[session_id] -= 1
+            if not self._active[session_id]:
+                del self._active[session_id]
+            if session_id in self._usage:
+                self._last_used[session_id] = time.time()
+
+    def forget(self, session_id: str):
+        """Stop accounting for a session whose directory was removed."""
+        with self._lock:
+            self._usage.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+
+    def _prune(self):
+        # Sessions removed without forget() would count against the capacity forever
+        with self._lock:
+            for session_id in list(self._usage):
+                if session_id not in self._active and not self.is_ram(session_id):
+                    self.forget(session_id)
+            for session_id in list(self._last_used):
+                if session_id not in self._usage:
+                    del self._last_used[session_id]
+
+    def measure(self, session_id: str) -> int:
+        """Refresh the RAM usage of a session and spill it if it is over the limit."""
+        if not self.is_ram(session_id):
+            return 0
+        usage = tree_usage(self.path(session_id))
+        with self._lock:
+            self._usage[session_id] = usage
+            self._last_used[session_id] = time.time()
+        if usage > self.session_limit:
+            self.spill(session_id)
+        return usage
+
+    def spill(self, session_id: str) -> bool:
+        """Move a RAM session to disk; returns whether it moved.
+
+        The copy runs without holding the lock; :meth:`acquire` of the session
+        waits until it is done.
+        """
+        with self._lock:
+            if not self.is_ram(session_id) or session_id in self._active or session_id in self._spilling:
+                return False
+            self._spilling.add(session_id)
+        link = self.path(session_id)
+        ram_path = os.path.realpath(link)
+        tmp_path = os.path.join(self.disk_dir, f".{session_id}.spill-{uuid.uuid4().hex}")
+        try:
+            try:
+                shutil.copytree(ram_path, tmp_path, symlinks=True)
+                os.remove(link)
+                os.rename(tmp_path, link)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if not os.path.lexists(link):
+                    os.symlink(ram_path, link)
+                raise
+            shutil.rmtree(ram_path, ignore_errors=True)
+            with self._lock:
+                self._usage.pop(session_id, None)
+                self._last_used.pop(session_id, None)
+            return True
+        finally:
+            with self._lock:
+                self._spilling.discard(session_id)
+                self._spilled.notify_all()
+
+    def rebalance(self) -> int:
+        """Spill oversized, idle and least recently used RAM sessions; returns how many moved."""
+        if not self.enabled:
+            return 0
+        spilled = 0
+        now = time.time()
+        self._prune()
+        with self._lock:
+            sessions = [name for name in os.listdir(self.ram_dir) if self.is_ram(name)]
+        for session_id in sessions:
+            usage = tree_usage(self.path(session_id))
+            with self._lock:
+                self._usage[session_id] = usage
+                last_used = self._last_used.setdefault(session_id, now)
+            if (usage > self.session_limit or now - last_used >= self.idle_seconds) and self.spill(session_id):
+                spilled += 1
+        for session_id in sorted(self._usage, key=lambda s: self._last_used.get(s, 0)):
+            if self.ram_used() <= self.capacity:
+                break
+            if self.spill(session_id):
+                spilled += 1
+        return spilled
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "ram_dir": self.ram_dir if self.enabled else None,
+                "capacity": self.capacity,
+                "session_limit": self.session_limit,
+                "used": self.ram_used(),
+                "sessions": dict(self._usage),
+            }
@@ -0,0 +1,233 @@
+import asyncio
+import io
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from code_interpreter_client import APIError, AsyncCodeInterpreterClient, CodeInterpreterClient, RetryPolicy
+from code_interpreter_client import async_client, client as sync_client
+
+BASE_URL = "http://service"
+
+
+def make_client(handler, **kwargs):
+    client = CodeInterpreterClient(BASE_URL, api_key="key", **kwargs)
+    client._client = httpx.Client(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    return client
+
+
+def make_async_client(handler, **kwargs):
+    client = AsyncCodeInterpreterClient(BASE_URL, api_key="key", **kwargs)
+    client._client = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    return client
+
+
+def responses(*items):
+    """Handler answering with ``items`` in turn; each is a status or a response."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        item = items[min(len(requests), len(items)) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return item if isinstance(item, httpx.Response) else httpx.Response(item, json={"detail": str(item)})
+
+    handler.requests = requests
+    return handler
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(sync_client.time, "sleep", sleeps.append)
+    return sleeps
+
+
+# RetryPolicy
+
+def test_retry_after_seconds():
+    policy = RetryPolicy(max_backoff=30)
+
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "7"})) == 7
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "120"})) == 30
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "-5"})) == 0
+
+
+def test_retry_after_http_date():
+    policy = RetryPolicy(max_backoff=30)
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=10), usegmt=True)
+
+    assert 8 <= policy.delay(0, httpx.Response(503, headers={"Retry-After": future})) <= 10
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": past})) == 0
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    policy = RetryPolicy(backoff_factor=0.5, max_backoff=3)
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+
+    assert [policy.delay(attempt) for attempt in range(5)] == [0.5, 1, 2, 3, 3]
+    # An unparseable Retry-After falls back to the backoff
+    assert policy.delay(1, httpx.Response(503, headers={"Retry-After": "soon"})) == 1
+
+
+def test_should_retry():
+    policy = RetryPolicy(max_retries=2)
+
+    assert policy.should_retry(0) and policy.should_retry(1, 429) and policy.should_retry(1, 503)
+    assert not policy.should_retry(0, 500) and not policy.should_retry(0, 400)
+    assert not policy.should_retry(2, 503)
+
+
+# Sync client
+
+def test_retries_429_and_503_honoring_retry_after(sleeps):
+    handler = responses(httpx.Response(429, headers={"Retry-After": "2"}), 503,
+                        httpx.Response(200, json={"status": "ok"}))
+
+    with make_client(handler, retry=RetryPolicy(max_backoff=0.01)) as client:
+        assert client.health() == {"status": "ok"}
+    assert len(handler.requests) == 3
+    assert sleeps[0] == 0.01 and len(sleeps) == 2
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 500])
+def test_other_errors_are_raised_without_retry(sleeps, status):
+    handler = responses(status)
+
+    with make_client(handler) as client:
+        with pytest.raises(APIError) as error:
+            client.execute("print(1)", "py")
+    assert error.value.status_code == status and error.value.detail == str(status)
+    assert len(handler.requests) == 1 and not sleeps
+
+
+def test_gives_up_after_max_retries(sleeps):
+    handler = responses(503)
+
+    with make_client(handler, retry=RetryPolicy(max_retries=3)) as client:
+        with pytest.raises(APIError):
+            client.health()
+    assert len(handler.requests) == 4 and len(sleeps) == 3
+
+
+def test_connect_errors_are_retried_but_read_errors_are_not(sleeps):
+    handler = responses(httpx.ConnectError("refused"), httpx.Response(200, json={}))
+    with make_client(handler) as client:
+        assert client.health() == {}
+    assert len(handler.requests) == 2
+
+    # The service may already have run the code
+    handler = responses(httpx.ReadError("reset"), httpx.Response(200, json={}))
+    with make_client(handler) as client:
+        with pytest.raises(httpx.ReadError):
+            client.execute("print(1)", "py")
+    assert len(handler.requests) == 1
+
+
+def test_upload_retry_resends_seekable_files(sleeps):
+    bodies = []
+
+    def handler(request):
+        bodies.append(request.read())
+        return httpx.Response(503 if len(bodies) == 1 else 200, json={"files": []})
+
+    fileobj = io.BytesIO(b"payload-bytes")
+    with make_client(handler) as client:
+        client.upload([("data.bin", fileobj)])
+    assert len(bodies) == 2
+    assert all(b"\r\n\r\npayload-bytes\r\n" in body for body in bodies)
+
+
+class Pipe(io.RawIOBase):
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.data.readinto(buffer)
+
+
+@pytest.mark.parametrize("first", [503, httpx.ConnectError("refused")])
+def test_upload_of_unseekable_source_is_not_retried(sleeps, first):
+    handler = responses(first, 200)
+
+    with make_client(handler) as client:
+        with pytest.raises((APIError, httpx.ConnectError)):
+            client.upload([("data.bin", Pipe(b"payload"))])
+    assert len(handler.requests) == 1 and not sleeps
+
+
+def test_execute_many_keeps_order_and_bounds_concurrency():
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def handler(request):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        code = request.read().decode()
+        return httpx.Response(200, json={"echo": code})
+
+    with make_client(handler) as client:
+        results = client.execute_many([{"code": f"print({i})", "lang": "py"} for i in range(20)], concurrency=4)
+    assert [f"print({i})" in result["echo"] for i, result in enumerate(results)] == [True] * 20
+    assert 1 < peak <= 4
+
+
+# Async client
+
+def test_async_retries_and_raises(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(async_client.asyncio, "sleep", fake_sleep)
+    handler = responses(httpx.Response(503, headers={"Retry-After": "1"}), httpx.Response(200, json={"ok": 1}))
+
+    async def run():
+        async with make_async_client(handler) as client:
+            assert await client.health() == {"ok": 1}
+        async with make_async_client(responses(422)) as client:
+            with pytest.raises(APIError):
+                await client.execute("x", "py")
+
+    asyncio.run(run())
+    assert sleeps == [1.0] and len(handler.requests) == 2
+
+
+def test_async_execute_many_keeps_order_and_bounds_concurrency():
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        code = (await request.aread()).decode()
+        if "print(3)" in code:
+            return httpx.Response(400, json={"detail": "bad"})
+        return httpx.Response(200, json={"echo": code})
+
+    async def run():
+        async with make_async_client(handler) as client:
+            return await client.execute_many([{"code": f"print({i})", "lang": "py"} for i in range(12)],
+                                             concurrency=3, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results[3], APIError)
+    assert all(f"print({i})" in result["echo"] for i, result in enumerate(results) if i != 3)
+    assert 1 < peak <= 3
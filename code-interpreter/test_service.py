@@ -1,20 +1,24 @@
 #!/usr/bin/env python3
 
-import requests
-import json
 import time
 
+from code_interpreter_client import APIError, CodeInterpreterClient
+
+BASE_URL = "http://localhost:8700"
+API_KEY = "your-code-api-key-here"
+
+client = CodeInterpreterClient(BASE_URL, api_key=API_KEY, timeout=30)
+
 def test_health_check():
     """Test the health check endpoint"""
     print("Testing health check endpoint...")
     try:
-        response = requests.get("http://localhost:8700/health", timeout=10)
-        if response.status_code == 200:
-            print("✅ Health check: PASSED")
-            return True
-        else:
-            print(f"❌ Health check: FAILED (Status code: {response.status_code})")
-            return False
+        client.health()
+        print("✅ Health check: PASSED")
+        return True
+    except APIError as e:
+        print(f"❌ Health check: FAILED (Status code: {e.status_code})")
+        return False
     except Exception as e:
         print(f"❌ Health check: FAILED (Error: {e})")
         return False
@@ -22,11 +26,6 @@ def test_health_check():
 def test_python_execution():
     """Test Python code execution"""
     print("\nTesting Python code execution...")
-    url = "http://localhost:8700/exec"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": "your-code-api-key-here"
-    }
     
     data = {
         "code": "print('Hello, World!')\nprint('This is a test of the code interpreter service.')",
@@ -34,16 +33,14 @@ def test_python_execution():
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ Python execution: PASSED")
-            print(f"   Output: {result['run'].get('stdout', '').strip()}")
-            return True
-        else:
-            print(f"❌ Python execution: FAILED (Status code: {response.status_code})")
-            print(f"   Response: {response.text}")
-            return False
+        result = client.execute(**data)
+        print("✅ Python execution: PASSED")
+        print(f"   Output: {result['run'].get('stdout', '').strip()}")
+        return True
+    except APIError as e:
+        print(f"❌ Python execution: FAILED (Status code: {e.status_code})")
+        print(f"   Response: {e.detail}")
+        return False
     except Exception as e:
         print(f"❌ Python execution: FAILED (Error: {e})")
         return False
@@ -51,11 +48,6 @@ def test_python_execution():
 def test_error_handling():
     """Test error handling with invalid code"""
     print("\nTesting error handling...")
-    url = "http://localhost:8700/exec"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": "your-code-api-key-here"
-    }
     
     data = {
         "code": "invalid_syntax_error",
@@ -63,17 +55,15 @@ def test_error_handling():
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        if response.status_code == 200:
-            result = response.json()
-            # Even with errors, we expect a successful response with error info
-            print("✅ Error handling: PASSED")
-            if result['run'].get('stderr'):
-                print(f"   Error captured: {result['run'].get('stderr', '').strip()[:100]}...")
-            return True
-        else:
-            print(f"❌ Error handling: FAILED (Status code: {response.status_code})")
-            return False
+        # Even with errors, we expect a successful response with error info
+        result = client.execute(**data)
+        print("✅ Error handling: PASSED")
+        if result['run'].get('stderr'):
+            print(f"   Error captured: {result['run'].get('stderr', '').strip()[:100]}...")
+        return True
+    except APIError as e:
+        print(f"❌ Error handling: FAILED (Status code: {e.status_code})")
+        return False
     except Exception as e:
         print(f"❌ Error handling: FAILED (Error: {e})")
         return False
@@ -81,11 +71,6 @@ def test_error_handling():
 def test_unauthorized_access():
     """Test unauthorized access"""
     print("\nTesting unauthorized access...")
-    url = "http://localhost:8700/exec"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": "wrong-api-key"
-    }
     
     data = {
         "code": "print('test')",
@@ -93,13 +78,16 @@ def test_unauthorized_access():
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        if response.status_code == 401:
+        with CodeInterpreterClient(BASE_URL, api_key="wrong-api-key", timeout=10) as unauthorized_client:
+            unauthorized_client.execute(**data)
+        print("❌ Unauthorized access: FAILED (Expected 401, got 200)")
+        return False
+    except APIError as e:
+        if e.status_code == 401:
             print("✅ Unauthorized access: PASSED (Correctly rejected)")
             return True
-        else:
-            print(f"❌ Unauthorized access: FAILED (Expected 401, got {response.status_code})")
-            return False
+        print(f"❌ Unauthorized access: FAILED (Expected 401, got {e.status_code})")
+        return False
     except Exception as e:
         print(f"❌ Unauthorized access: FAILED (Error: {e})")
         return False
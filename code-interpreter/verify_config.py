@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-import requests
-import json
 import os
 
+import httpx
+
+from code_interpreter_client import APIError, CodeInterpreterClient
+
 def verify_service_configuration():
     """Verify that the code interpreter service is properly configured"""
     
@@ -31,13 +33,13 @@ def verify_service_configuration():
     if code_baseurl:
         try:
             print(f"\n📡 Testing connection to {code_baseurl}...")
-            response = requests.get(f"{code_baseurl}/health", timeout=5)
-            if response.status_code == 200:
-                print("✅ Service is reachable")
-                print(f"   Status: {response.json()}")
-            else:
-                print(f"❌ Service returned status code: {response.status_code}")
-        except requests.exceptions.RequestException as e:
+            with CodeInterpreterClient(code_baseurl, api_key=code_api_key, timeout=5) as client:
+                status = client.health()
+            print("✅ Service is reachable")
+            print(f"   Status: {status}")
+        except APIError as e:
+            print(f"❌ Service returned status code: {e.status_code}")
+        except httpx.HTTPError as e:
             print(f"❌ Connection failed: {e}")
         except Exception as e:
             print(f"❌ Unexpected error: {e}")